@@ -1,17 +1,31 @@
 import uvicorn
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Literal, Optional
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import (FastAPI, UploadFile, File, Form, HTTPException, Query, Request, Response,
+                     WebSocket, WebSocketDisconnect)
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import numpy as np
 import cv2
-import tempfile
 import os
-from functools import lru_cache
+import time
 import face_recognition  
 from io import BytesIO
 
+from gallery import EmbeddingGallery, IdentificationIndex, UserTemplates, as_embedding_matrix, template_distances
+from gallery_store import MappedEmbeddingGallery
+from workers import EncodePool, PoolUnavailable
+from shared_frames import SlabPool
+from batching import MicroBatcher
+from face_compat import batch_face_descriptors
+from cache import MISS, EncodingCache, content_key
+from quality import QualityGate, QualityRejected, image_metrics
+import wire
+import metrics
+from streaming import LatestFrame
+
 # Suppress warnings
 os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
@@ -38,6 +52,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+metrics.registry.describe("face_auth_request_seconds", "Request latency by endpoint")
+metrics.registry.describe("face_auth_requests_total", "Requests by endpoint and status code")
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time every request and count it by route template and status"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.registry.observe(
+            "face_auth_request_seconds", time.perf_counter() - start,
+            endpoint=endpoint, method=request.method)
+        metrics.registry.inc(
+            "face_auth_requests_total", endpoint=endpoint, method=request.method, status=status)
+
 # Configuration
 FACE_MODEL = os.getenv("FACE_MODEL", "Facenet")  # Kept for compatibility
 # Optimized threshold
@@ -48,24 +84,174 @@ DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "hog")
 DISTANCE_METRIC = os.getenv(
     "DISTANCE_METRIC", "euclidean")  # euclidean or cosine
 
+# Log per-image pixel statistics (a full pass over the pixels per encode)
+DEBUG_IMAGE_STATS = os.getenv("DEBUG_IMAGE_STATS", "False").lower() == "true"
+
 # Image preprocessing settings
 MAX_IMAGE_SIZE = 1024  # Resize large images for faster processing
+# Let libjpeg decode large JPEGs at 1/2, 1/4 or 1/8 scale instead of full size
+DECODE_DOWNSCALE = os.getenv("DECODE_DOWNSCALE", "True").lower() == "true"
 # More jitters = more accurate but slower
 NUM_JITTERS = int(os.getenv("NUM_JITTERS", "1"))
+# Landmark model used to align faces before encoding: "large" (68 points) or
+# "small" (5 points, faster). Embeddings from the two models are close but
+# not identical, so enroll and verify with the same model.
+LANDMARK_MODEL = os.getenv("LANDMARK_MODEL", "large").lower()
+# Detector upsampling: a fixed count ("0", "1", "2") or "adaptive", which
+# upsamples small images until their longest side reaches UPSAMPLE_TARGET_SIZE
+UPSAMPLE_POLICY = os.getenv("UPSAMPLE_POLICY", "1").lower()
+UPSAMPLE_TARGET_SIZE = int(os.getenv("UPSAMPLE_TARGET_SIZE", "640"))
+MAX_UPSAMPLE = 2
+if LANDMARK_MODEL not in ("large", "small"):
+    raise ValueError(f"LANDMARK_MODEL must be 'large' or 'small', got {LANDMARK_MODEL!r}")
+if UPSAMPLE_POLICY != "adaptive" and not UPSAMPLE_POLICY.isdigit():
+    raise ValueError(f"UPSAMPLE_POLICY must be a count or 'adaptive', got {UPSAMPLE_POLICY!r}")
+# Two-scale detection: find faces on a copy this size (longest side), then
+# encode at full resolution. 0 = detect on the full image.
+DETECTION_SIZE = int(os.getenv("DETECTION_SIZE", "0"))
+# Upsampling used on the detection thumbnail (a selfie face is large)
+DETECTION_SIZE_UPSAMPLE = int(os.getenv("DETECTION_SIZE_UPSAMPLE", "0"))
+# Sanity limits for client-supplied face boxes (after preprocessing)
+FACE_HINT_MIN_SIZE = int(os.getenv("FACE_HINT_MIN_SIZE", "40"))
+FACE_HINT_MIN_ASPECT = float(os.getenv("FACE_HINT_MIN_ASPECT", "0.5"))
+
+# Quality gate: reject tiny, blurry or badly exposed faces before encoding.
+# Off by default: the thresholds need tuning against each client's cameras
+QUALITY_GATE = os.getenv("QUALITY_GATE", "False").lower() == "true"
+# Variance of the Laplacian inside the face box
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "20"))
+# Mean gray level inside the face box (0-255)
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "40"))
+QUALITY_MAX_BRIGHTNESS = float(os.getenv("QUALITY_MAX_BRIGHTNESS", "220"))
+# Largest fraction of near-black or near-white pixels
+QUALITY_MAX_CLIPPED = float(os.getenv("QUALITY_MAX_CLIPPED", "0.5"))
+# Shorter side of the face box, in preprocessed pixels
+QUALITY_MIN_FACE_SIZE = int(os.getenv("QUALITY_MIN_FACE_SIZE", "48"))
+
+# Encode execution: "inline" runs on the event loop, "process" uses a worker pool
+ENCODE_EXECUTION = os.getenv("ENCODE_EXECUTION", "inline").lower()
+# 0 = one worker per available core
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "0"))
+# Jobs allowed to wait for a worker before /encode returns 503 (0 = 2x workers)
+ENCODE_QUEUE_SIZE = int(os.getenv("ENCODE_QUEUE_SIZE", "0"))
+# Hand uploads of at least ENCODE_SHM_MIN_BYTES to pool workers through
+# reusable shared-memory slabs instead of pickling them
+ENCODE_SHARED_MEMORY = os.getenv("ENCODE_SHARED_MEMORY", "True").lower() == "true"
+ENCODE_SHM_MIN_BYTES = int(os.getenv("ENCODE_SHM_MIN_BYTES", str(256 * 1024)))
+ENCODE_SHM_MAX_SLABS = int(os.getenv("ENCODE_SHM_MAX_SLABS", "64"))
+# Total /dev/shm the slabs may use; keep it well under the container's
+# /dev/shm size (64MB by default under Docker). Idle slabs are unlinked.
+ENCODE_SHM_MAX_BYTES = int(os.getenv("ENCODE_SHM_MAX_BYTES", str(32 * 1024 * 1024)))
+ENCODE_SHM_IDLE_SECONDS = float(os.getenv("ENCODE_SHM_IDLE_SECONDS", "60"))
+
+# Micro-batching of concurrent /encode requests. Only the CNN detector has
+# a batched form; HOG batches would just serialize on one worker, so the
+# setting is ignored unless DETECTOR_BACKEND=cnn
+ENCODE_BATCHING = os.getenv("ENCODE_BATCHING", "False").lower() == "true"
+# How long the first request of a batch waits for others to join
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "10"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+
+# Content-hash cache of encode results (0 entries disables it)
+ENCODE_CACHE_SIZE = int(os.getenv("ENCODE_CACHE_SIZE", "1024"))
+ENCODE_CACHE_TTL = float(os.getenv("ENCODE_CACHE_TTL", "300"))
+
+# Most images accepted by one /encode-batch request
+ENCODE_BATCH_MAX_FILES = int(os.getenv("ENCODE_BATCH_MAX_FILES", "20"))
+
+# /verify-burst: frames that must match before accepting, and most frames per request
+BURST_REQUIRED_MATCHES = int(os.getenv("BURST_REQUIRED_MATCHES", "2"))
+BURST_MAX_FRAMES = int(os.getenv("BURST_MAX_FRAMES", "10"))
+
+# /ws/verify: largest frame accepted on the continuous-authentication stream
+STREAM_MAX_FRAME_BYTES = int(os.getenv("STREAM_MAX_FRAME_BYTES", str(2 * 1024 * 1024)))
+
+# Directory of the memory-mapped gallery shared by all workers ('' = in-process only)
+GALLERY_DIR = os.getenv("GALLERY_DIR", "")
+
+# Consolidated templates (opt-in): keep each enrolled user as a running
+# centroid plus at most this many diverse exemplars. The default 0 stores
+# every embedding as enrolled
+TEMPLATE_MAX_EXEMPLARS = int(os.getenv("TEMPLATE_MAX_EXEMPLARS", "0"))
+# Fold probes that /match/{user_id} verifies into the user's template. Only
+# probes under the stricter TEMPLATE_UPDATE_THRESHOLD are used, so borderline
+# (possibly impostor) matches never drift the template. Requires
+# TEMPLATE_MAX_EXEMPLARS > 0; unconsolidated users would grow on every match
+TEMPLATE_UPDATE_ON_MATCH = os.getenv("TEMPLATE_UPDATE_ON_MATCH", "false").lower() == "true"
+TEMPLATE_UPDATE_THRESHOLD = float(os.getenv("TEMPLATE_UPDATE_THRESHOLD", "0.4"))
+
+# 1:N identification settings
+IDENTIFY_TOP_K = int(os.getenv("IDENTIFY_TOP_K", "5"))
+# Rows scanned per matrix product; bounds temporary memory per search
+IDENTIFY_BLOCK_SIZE = int(os.getenv("IDENTIFY_BLOCK_SIZE", "16384"))
+# IVF coarse clustering: 0 = auto (~sqrt(n) lists), -1 = disabled
+IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+# IVF only kicks in once this many embeddings are enrolled
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "20000"))
+# Enrollments are added to the existing IVF lists; the centroids are
+# retrained in the background once the gallery grows by this factor
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "2.0"))
+# Scan a quantized copy of the gallery ('none', 'float16' or 'int8') and
+# re-rank the best IDENTIFY_RERANK_FACTOR x top_k rows on exact float32.
+# This trades search latency for memory: numpy has no int8/float16 BLAS,
+# so every block is widened to float32 before the product. int8 keeps a
+# quarter of the memory but scans slower than float32 (from ~15% to a few
+# times, depending on the CPU); float16 halves memory and is ~5x slower.
+# The saving only applies to the in-process gallery: with GALLERY_DIR the
+# rows are already shared through the mapped file, so they are scanned
+# directly and this setting is ignored
+IDENTIFY_QUANTIZATION = os.getenv("IDENTIFY_QUANTIZATION", "none").lower()
+IDENTIFY_RERANK_FACTOR = int(os.getenv("IDENTIFY_RERANK_FACTOR", "4"))
+
+
+# Embedding encodings in JSON responses: float list, or base64 float32.
+# Raw float32 bytes are chosen with Accept: application/octet-stream instead
+EmbeddingFormat = Literal["json", "base64"]
 
 
 # Pydantic models
+class QualityRejection(BaseModel):
+    """Why an image was rejected by the quality gate"""
+    reason: str
+    metrics: Dict[str, float]
+
+
+class BatchEncodingItem(BaseModel):
+    """Per-image result of /encode-batch"""
+    index: int
+    filename: Optional[str] = None
+    success: bool
+    embedding: Optional[List[float]] = None
+    embedding_b64: Optional[str] = None
+    error: Optional[str] = None
+    rejection: Optional[QualityRejection] = None
+
+
+class BatchEncodingResponse(BaseModel):
+    """Response model for multi-image encoding"""
+    success: bool
+    encoded: int
+    results: List[BatchEncodingItem]
+    template: Optional[List[float]] = None
+    template_b64: Optional[str] = None
+
+
 class MatchRequest(BaseModel):
-    """Request model for face matching"""
-    new_embedding: List[float]
-    stored_embeddings: List[List[float]]
+    """Request model for face matching (lists or base64 float32)"""
+    new_embedding: Optional[List[float]] = None
+    stored_embeddings: Optional[List[List[float]]] = None
+    new_embedding_b64: Optional[str] = None
+    stored_embeddings_b64: Optional[str] = None
 
 
 class EncodingResponse(BaseModel):
     """Response model for face encoding"""
     success: bool
     embedding: Optional[List[float]] = None
+    embedding_b64: Optional[str] = None
     error: Optional[str] = None
+    rejection: Optional[QualityRejection] = None
 
 
 class MatchResponse(BaseModel):
@@ -74,24 +260,197 @@ class MatchResponse(BaseModel):
     distance: Optional[float] = None
 
 
+class EnrollRequest(BaseModel):
+    """Request model for enrolling embeddings into the server-side gallery"""
+    embeddings: Optional[List[List[float]]] = None
+    embeddings_b64: Optional[str] = None
+    replace: bool = False
+
+
+class EnrollResponse(BaseModel):
+    """Response model for gallery enrollment"""
+    user_id: str
+    count: int  # stored exemplars (a consolidated centroid is not counted)
+    observations: int  # embeddings enrolled or folded in so far
+
+
+class ProbeMatchRequest(BaseModel):
+    """Request model for matching against an enrolled user"""
+    new_embedding: Optional[List[float]] = None
+    new_embedding_b64: Optional[str] = None
+
+
+class BurstFrameResult(BaseModel):
+    """Outcome of one processed frame of a burst"""
+    index: int
+    success: bool
+    match: bool = False
+    distance: Optional[float] = None
+    error: Optional[str] = None
+
+
+class VerifyBurstResponse(BaseModel):
+    """Response model for multi-frame verification"""
+    match: bool
+    distance: Optional[float] = None
+    frames_received: int
+    frames_processed: int
+    frames_matched: int
+    required_matches: int
+    frames: List[BurstFrameResult]
+
+
+class IdentifyRequest(BaseModel):
+    """Request model for 1:N identification"""
+    new_embedding: Optional[List[float]] = None
+    new_embedding_b64: Optional[str] = None
+    top_k: Optional[int] = None
+
+
+class IdentifyCandidate(BaseModel):
+    """One candidate returned by identification"""
+    user_id: str
+    distance: float
+    match: bool
+
+
+class IdentifyResponse(BaseModel):
+    """Response model for 1:N identification"""
+    match: bool
+    user_id: Optional[str] = None
+    candidates: List[IdentifyCandidate]
+
+
+# Enrolled embeddings, kept server-side so /match/{user_id} only needs the probe.
+# With GALLERY_DIR set, every uvicorn worker maps the same on-disk store.
+# Consolidated users keep a constant number of rows however often they enroll.
+gallery = (MappedEmbeddingGallery(GALLERY_DIR, max_exemplars=TEMPLATE_MAX_EXEMPLARS)
+           if GALLERY_DIR else EmbeddingGallery(max_exemplars=TEMPLATE_MAX_EXEMPLARS))
+if TEMPLATE_UPDATE_ON_MATCH and TEMPLATE_MAX_EXEMPLARS <= 0:
+    logger.warning(
+        "TEMPLATE_UPDATE_ON_MATCH ignored: it needs TEMPLATE_MAX_EXEMPLARS > 0, "
+        "otherwise every verified probe would be stored as a new row")
+# 1:N index over every enrolled embedding, updated incrementally after enrollment changes
+identify_index = IdentificationIndex(
+    gallery,
+    block_size=IDENTIFY_BLOCK_SIZE,
+    ivf_lists=IVF_LISTS,
+    ivf_nprobe=IVF_NPROBE,
+    ivf_min_size=IVF_MIN_SIZE,
+    quantization=IDENTIFY_QUANTIZATION,
+    rerank_factor=IDENTIFY_RERANK_FACTOR,
+    retrain_growth=IVF_RETRAIN_GROWTH
+)
+
+quality_gate = QualityGate(
+    min_sharpness=QUALITY_MIN_SHARPNESS,
+    min_brightness=QUALITY_MIN_BRIGHTNESS,
+    max_brightness=QUALITY_MAX_BRIGHTNESS,
+    max_clipped=QUALITY_MAX_CLIPPED,
+    min_face_size=QUALITY_MIN_FACE_SIZE
+) if QUALITY_GATE else None
+
+encode_pool = (
+    EncodePool(
+        max_workers=ENCODE_WORKERS,
+        max_queue=ENCODE_QUEUE_SIZE,
+        slab_pool=SlabPool(ENCODE_SHM_MIN_BYTES, ENCODE_SHM_MAX_SLABS,
+                           ENCODE_SHM_MAX_BYTES, ENCODE_SHM_IDLE_SECONDS)
+        if ENCODE_SHARED_MEMORY else None
+    )
+    if ENCODE_EXECUTION == "process" else None
+)
+
+
 # ================== HELPER FUNCTIONS ==================
 
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
+# JPEG start-of-frame markers (SOF0-SOF15 except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_dimensions(image_bytes: bytes) -> Optional[tuple]:
+    """
+    Read (width, height) from a JPEG header without decoding the image
+
+    Args:
+        image_bytes: Raw image bytes
+
+    Returns:
+        tuple: (width, height), or None if the bytes are not a parseable JPEG
+    """
+    if image_bytes[:2] != b"\xff\xd8":
+        return None
+
+    i, n = 2, len(image_bytes)
+    while i + 9 <= n:
+        if image_bytes[i] != 0xFF:
+            return None
+        marker = image_bytes[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Standalone markers carry no length
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(image_bytes[i + 5:i + 7], "big")
+            width = int.from_bytes(image_bytes[i + 7:i + 9], "big")
+            return (width, height) if width and height else None
+        i += 2 + int.from_bytes(image_bytes[i + 2:i + 4], "big")
+
+    return None
+
+
+def reduced_decode_flag(image_bytes: bytes, max_size: int = MAX_IMAGE_SIZE) -> tuple:
+    """
+    Pick the cheapest cv2.imdecode mode that still yields >= max_size pixels
+
+    Args:
+        image_bytes: Raw image bytes
+        max_size: Target size of the longest side
+
+    Returns:
+        tuple: (imdecode flag, scale denominator)
+    """
+    dims = jpeg_dimensions(image_bytes) if DECODE_DOWNSCALE else None
+    if dims:
+        longest = max(dims)
+        for scale, flag in _REDUCED_DECODE_FLAGS:
+            if longest // scale >= max_size:
+                return flag, scale
+    return cv2.IMREAD_COLOR, 1
+
+
+def preprocess_image(image_bytes: bytes, return_scale: bool = False):
     """
     Preprocess image for face detection with OpenCV for better compatibility
 
     Args:
         image_bytes: Raw image bytes
+        return_scale: Also return the preprocessed/original size ratio
 
     Returns:
-        np.ndarray: Preprocessed image in RGB format (uint8)
+        np.ndarray: Preprocessed image in RGB format (uint8), or
+        (image, scale) if return_scale is set
     """
     try:
         # Convert bytes to numpy array
         nparr = np.frombuffer(image_bytes, np.uint8)
         
-        # Decode image with OpenCV (most compatible with face_recognition)
-        image_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode image with OpenCV (most compatible with face_recognition).
+        # Large JPEGs are decoded straight to a reduced size, which skips
+        # most of the IDCT work and the full-resolution buffer.
+        decode_flag, decode_scale = reduced_decode_flag(image_bytes, MAX_IMAGE_SIZE)
+        with metrics.stage("decode"):
+            image_bgr = cv2.imdecode(nparr, decode_flag)
         
         if image_bgr is None:
             # If OpenCV fails, try PIL as fallback
@@ -101,12 +460,26 @@ def preprocess_image(image_bytes: bytes) -> np.ndarray:
             try:
                 pil_image = Image.open(BytesIO(image_bytes))
                 logger.info(f"PIL loaded image - Mode: {pil_image.mode}, Size: {pil_image.size}")
+                original_longest = max(pil_image.size)
+
+                # For JPEGs, draft() makes the decoder scale down while decoding
+                if DECODE_DOWNSCALE and max(pil_image.size) > MAX_IMAGE_SIZE:
+                    ratio = MAX_IMAGE_SIZE / max(pil_image.size)
+                    pil_image.draft(
+                        "RGB",
+                        (int(pil_image.size[0] * ratio), int(pil_image.size[1] * ratio))
+                    )
                 
                 # Convert to RGB if needed
                 if pil_image.mode != "RGB":
                     pil_image = pil_image.convert("RGB")
                     logger.info("Converted image to RGB mode")
                 
+                # Resize if too large
+                if max(pil_image.size) > MAX_IMAGE_SIZE:
+                    with metrics.stage("resize"):
+                        pil_image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.LANCZOS)
+
                 # Convert to numpy array
                 image_rgb = np.array(pil_image)
                 
@@ -115,14 +488,23 @@ def preprocess_image(image_bytes: bytes) -> np.ndarray:
                     image_rgb = image_rgb.astype(np.uint8)
                     logger.info(f"Converted array to uint8 from {image_rgb.dtype}")
                 
-                return np.ascontiguousarray(image_rgb, dtype=np.uint8)
+                image_rgb = np.ascontiguousarray(image_rgb, dtype=np.uint8)
+                if return_scale:
+                    return image_rgb, max(image_rgb.shape[:2]) / original_longest
+                return image_rgb
                 
             except Exception as pil_error:
                 raise ValueError(f"Both OpenCV and PIL failed to decode image. PIL error: {str(pil_error)}")
         
         # OpenCV succeeded - convert BGR to RGB
-        logger.info(f"OpenCV decoded image - Shape: {image_bgr.shape}, Dtype: {image_bgr.dtype}")
-        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        logger.info(
+            f"OpenCV decoded image - Shape: {image_bgr.shape}, Dtype: {image_bgr.dtype}, "
+            f"Decode scale: 1/{decode_scale}")
+        with metrics.stage("color"):
+            image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        original_longest = (
+            max(jpeg_dimensions(image_bytes)) if decode_scale > 1 else max(image_rgb.shape[:2])
+        )
         
         # Resize if too large
         height, width = image_rgb.shape[:2]
@@ -130,23 +512,165 @@ def preprocess_image(image_bytes: bytes) -> np.ndarray:
             ratio = MAX_IMAGE_SIZE / max(width, height)
             new_width = int(width * ratio)
             new_height = int(height * ratio)
-            image_rgb = cv2.resize(image_rgb, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            with metrics.stage("resize"):
+                image_rgb = cv2.resize(image_rgb, (new_width, new_height), interpolation=cv2.INTER_AREA)
             logger.info(f"Resized image from {width}x{height} to {new_width}x{new_height}")
         
         # Ensure contiguous array in memory
-        return np.ascontiguousarray(image_rgb, dtype=np.uint8)
+        image_rgb = np.ascontiguousarray(image_rgb, dtype=np.uint8)
+        if return_scale:
+            return image_rgb, max(image_rgb.shape[:2]) / original_longest
+        return image_rgb
         
     except Exception as e:
         logger.error(f"Error preprocessing image: {str(e)}")
         raise
 
 
-def encode_face_optimized(image_rgb: np.ndarray) -> Optional[List[float]]:
+def upsample_times(image_shape: tuple) -> int:
+    """
+    Detector upsampling for an image under UPSAMPLE_POLICY
+
+    Each upsample doubles the image the detector scans (about 4x the
+    cost) and lets HOG find faces half as large. A frontal selfie fills
+    the frame, so large images need none.
+
+    Args:
+        image_shape: Shape of the image handed to the detector
+
+    Returns:
+        int: number_of_times_to_upsample
+    """
+    if UPSAMPLE_POLICY != "adaptive":
+        return int(UPSAMPLE_POLICY)
+
+    longest = max(image_shape[:2])
+    times = 0
+    while times < MAX_UPSAMPLE and longest * 2 ** times < UPSAMPLE_TARGET_SIZE:
+        times += 1
+    return times
+
+
+def detect_faces(image_rgb: np.ndarray) -> List[tuple]:
+    """
+    Find face boxes, on a downscaled copy when DETECTION_SIZE is set
+
+    Boxes found on the thumbnail are mapped back to full-resolution
+    coordinates. If the thumbnail yields nothing, detection falls back to
+    the full image with the default upsampling.
+
+    Args:
+        image_rgb: Image in RGB format
+
+    Returns:
+        List[tuple]: (top, right, bottom, left) boxes in image coordinates
+    """
+    thumbnail, scale = detection_thumbnail(image_rgb)
+    if thumbnail is not None:
+        locations = face_recognition.face_locations(
+            thumbnail,
+            number_of_times_to_upsample=DETECTION_SIZE_UPSAMPLE,
+            model=DETECTOR_BACKEND
+        )
+        if locations:
+            return scale_locations(locations, scale, image_rgb.shape)
+        logger.info(
+            f"No face found at {thumbnail.shape[1]}x{thumbnail.shape[0]}, "
+            f"retrying at full resolution")
+
+    return face_recognition.face_locations(
+        image_rgb,
+        number_of_times_to_upsample=upsample_times(image_rgb.shape),
+        model=DETECTOR_BACKEND
+    )
+
+
+def detection_thumbnail(image_rgb: np.ndarray):
+    """
+    Downscaled copy of an image for detection under DETECTION_SIZE
+
+    Returns:
+        (np.ndarray, float): The thumbnail and its scale, or (None, 1.0)
+        if the image is small enough to search as is
+    """
+    height, width = image_rgb.shape[:2]
+    if DETECTION_SIZE <= 0 or max(height, width) <= DETECTION_SIZE:
+        return None, 1.0
+    scale = DETECTION_SIZE / max(height, width)
+    thumbnail = cv2.resize(
+        image_rgb,
+        (max(1, int(width * scale)), max(1, int(height * scale))),
+        interpolation=cv2.INTER_AREA
+    )
+    return thumbnail, scale
+
+
+def scale_locations(locations: List[tuple], scale: float, image_shape: tuple) -> List[tuple]:
+    """Map boxes found on a thumbnail back to full-resolution coordinates"""
+    height, width = image_shape[:2]
+    return [
+        (
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale)))
+        )
+        for top, right, bottom, left in locations
+    ]
+
+
+class InvalidFaceBox(ValueError):
+    """Raised when a client-supplied face box does not fit the decoded image"""
+
+
+def face_location_from_hint(face_box, image_shape: tuple, scale: float = 1.0) -> tuple:
+    """
+    Validate a client-supplied face box and convert it to a face location
+
+    Args:
+        face_box: (x, y, width, height) in pixels of the uploaded image
+        image_shape: Shape of the preprocessed image
+        scale: Preprocessed/uploaded size ratio from preprocess_image
+
+    Returns:
+        tuple: (top, right, bottom, left) in preprocessed image coordinates
+
+    Raises:
+        InvalidFaceBox: If the box is degenerate, outside the image or implausible
+    """
+    x, y, w, h = (float(v) for v in face_box)
+    height, width = image_shape[:2]
+    # Bounds of the uploaded image, with a little slack for rounding
+    original_w, original_h = width / scale, height / scale
+    slack = 0.02 * max(original_w, original_h)
+
+    if w <= 0 or h <= 0:
+        raise InvalidFaceBox("Invalid face box: width and height must be positive")
+    if x < -slack or y < -slack or x + w > original_w + slack or y + h > original_h + slack:
+        raise InvalidFaceBox(
+            f"Invalid face box: ({x:g}, {y:g}, {w:g}, {h:g}) is outside the "
+            f"{original_w:.0f}x{original_h:.0f} image")
+    if not FACE_HINT_MIN_ASPECT <= w / h <= 1 / FACE_HINT_MIN_ASPECT:
+        raise InvalidFaceBox(f"Invalid face box: implausible aspect ratio {w / h:.2f}")
+
+    top = max(0, int(round(y * scale)))
+    left = max(0, int(round(x * scale)))
+    bottom = min(height, int(round((y + h) * scale)))
+    right = min(width, int(round((x + w) * scale)))
+    if min(bottom - top, right - left) < FACE_HINT_MIN_SIZE:
+        raise InvalidFaceBox(
+            f"Invalid face box: face is smaller than {FACE_HINT_MIN_SIZE}px after preprocessing")
+
+    return (top, right, bottom, left)
+
+
+def encode_face_optimized(image_rgb: np.ndarray, face_locations: Optional[List[tuple]] = None) -> Optional[List[float]]:
     """
     Generate face embedding using optimized face_recognition library
 
     Args:
         image_rgb: Image in RGB format
+        face_locations: Known (top, right, bottom, left) boxes; skips detection
 
     Returns:
         List[float]: Face embedding or None if no face detected
@@ -160,13 +684,15 @@ def encode_face_optimized(image_rgb: np.ndarray) -> Optional[List[float]]:
             logger.warning(f"Converting image from {image_rgb.dtype} to uint8")
             image_rgb = image_rgb.astype(np.uint8)
         
-        logger.info(f"Encoding face - Shape: {image_rgb.shape}, Dtype: {image_rgb.dtype}, Min: {image_rgb.min()}, Max: {image_rgb.max()}")
+        if DEBUG_IMAGE_STATS:
+            logger.info(f"Encoding face - Shape: {image_rgb.shape}, Dtype: {image_rgb.dtype}, Min: {image_rgb.min()}, Max: {image_rgb.max()}")
+        else:
+            logger.info(f"Encoding face - Shape: {image_rgb.shape}, Dtype: {image_rgb.dtype}")
         
-        # Detect face locations
-        face_locations = face_recognition.face_locations(
-            image_rgb,
-            model=DETECTOR_BACKEND
-        )
+        # Detect face locations unless the client already supplied them
+        if face_locations is None:
+            with metrics.stage("detect"):
+                face_locations = detect_faces(image_rgb)
 
         if not face_locations:
             logger.warning("No face detected in image")
@@ -178,11 +704,13 @@ def encode_face_optimized(image_rgb: np.ndarray) -> Optional[List[float]]:
                 f"Multiple faces detected ({len(face_locations)}), using the first one")
 
         # Generate face encodings
-        face_encodings = face_recognition.face_encodings(
-            image_rgb,
-            known_face_locations=face_locations,
-            num_jitters=NUM_JITTERS
-        )
+        with metrics.stage("encode"):
+            face_encodings = face_recognition.face_encodings(
+                image_rgb,
+                known_face_locations=face_locations,
+                num_jitters=NUM_JITTERS,
+                model=LANDMARK_MODEL
+            )
 
         if not face_encodings:
             logger.warning("Failed to generate face encoding")
@@ -200,6 +728,188 @@ def encode_face_optimized(image_rgb: np.ndarray) -> Optional[List[float]]:
         raise
 
 
+def encode_image_bytes(image_bytes: bytes, face_box: Optional[tuple] = None,
+                       pre_cropped: bool = False) -> Optional[List[float]]:
+    """
+    Full decode/detect/encode pipeline for one uploaded image
+
+    Module-level so it can be shipped to worker processes.
+
+    Args:
+        image_bytes: Raw image bytes
+        face_box: Client-detected (x, y, width, height); skips detection
+        pre_cropped: The image is a tight face crop; skips detection
+
+    Returns:
+        List[float]: Face embedding or None if no face detected
+
+    Raises:
+        InvalidFaceBox: If face_box does not fit the decoded image
+        QualityRejected: If the face fails the quality gate
+    """
+    image_rgb, scale = preprocess_image(image_bytes, return_scale=True)
+
+    if face_box is not None:
+        face_locations = [face_location_from_hint(face_box, image_rgb.shape, scale)]
+    elif pre_cropped:
+        height, width = image_rgb.shape[:2]
+        face_locations = [(0, width, height, 0)]
+    else:
+        with metrics.stage("detect"):
+            face_locations = detect_faces(image_rgb)
+        if not face_locations:
+            logger.warning("No face detected in image")
+            return None
+
+    if quality_gate is not None:
+        with metrics.stage("quality"):
+            quality_gate.check(image_rgb, face_locations[0])
+
+    return encode_face_optimized(image_rgb, face_locations)
+
+
+def _batch_face_locations(images_rgb: List[np.ndarray]) -> List[list]:
+    """
+    Detect faces in several images, batching the CNN detector where possible
+
+    Each image is searched the way detect_faces() would (on its
+    DETECTION_SIZE thumbnail, then at full resolution if that finds
+    nothing). batch_face_locations needs equally sized images with the
+    same upsampling, so detector inputs are grouped by both; HOG has no
+    batched form and runs per image.
+    """
+    if DETECTOR_BACKEND != "cnn":
+        return [detect_faces(img) for img in images_rgb]
+
+    locations: List[list] = [[] for _ in images_rgb]
+    inputs = []
+    for img in images_rgb:
+        thumbnail, scale = detection_thumbnail(img)
+        if thumbnail is not None:
+            inputs.append((thumbnail, DETECTION_SIZE_UPSAMPLE, scale))
+        else:
+            inputs.append((img, upsample_times(img.shape), 1.0))
+    found = _cnn_locations([(img, upsample) for img, upsample, _ in inputs])
+
+    retry = []
+    for i, (img, locs, (_, _, scale)) in enumerate(zip(images_rgb, found, inputs)):
+        if scale == 1.0:
+            locations[i] = locs
+        elif locs:
+            locations[i] = scale_locations(locs, scale, img.shape)
+        else:
+            retry.append(i)
+    if retry:
+        logger.info(f"No face found on {len(retry)} detection thumbnails, retrying at full resolution")
+        found = _cnn_locations([
+            (images_rgb[i], upsample_times(images_rgb[i].shape)) for i in retry])
+        for i, locs in zip(retry, found):
+            locations[i] = locs
+
+    return locations
+
+
+def _cnn_locations(inputs: List[tuple]) -> List[list]:
+    """Run the CNN detector over (image, upsample) pairs, batching equal shapes"""
+    locations: List[list] = [[] for _ in inputs]
+    groups: Dict[tuple, List[int]] = {}
+    for i, (img, upsample) in enumerate(inputs):
+        groups.setdefault((img.shape, upsample), []).append(i)
+
+    for (_, upsample), indices in groups.items():
+        batch = [inputs[i][0] for i in indices]
+        if len(batch) == 1:
+            found = [face_recognition.face_locations(
+                batch[0], number_of_times_to_upsample=upsample, model="cnn")]
+        else:
+            found = face_recognition.batch_face_locations(
+                batch, number_of_times_to_upsample=upsample, batch_size=len(batch))
+        for i, locs in zip(indices, found):
+            locations[i] = locs
+
+    return locations
+
+
+def _batch_face_encodings(images_rgb: List[np.ndarray], locations: List[tuple]) -> List[np.ndarray]:
+    """
+    Encode one face per image, using dlib's batched descriptor call if available
+
+    Args:
+        images_rgb: Images that each contain a detected face
+        locations: The face location to encode in each image
+
+    Returns:
+        List[np.ndarray]: One 128-d encoding per image
+    """
+    encodings = batch_face_descriptors(images_rgb, locations, LANDMARK_MODEL, NUM_JITTERS)
+    if encodings is not None:
+        return encodings
+    return [
+        face_recognition.face_encodings(
+            img, known_face_locations=[loc], num_jitters=NUM_JITTERS, model=LANDMARK_MODEL)[0]
+        for img, loc in zip(images_rgb, locations)
+    ]
+
+
+def encode_images_batch(images_bytes: List[bytes]) -> List[Any]:
+    """
+    Batched decode/detect/encode pipeline for several uploaded images
+
+    Module-level so a whole batch can be shipped to a worker process.
+
+    Args:
+        images_bytes: Raw bytes of each image
+
+    Returns:
+        List: Per image, the embedding, None if no face was found, or the
+        Exception raised while processing that image (QualityRejected for
+        images that fail the quality gate)
+    """
+    results: List[Any] = [None] * len(images_bytes)
+    decoded = []
+    for i, content in enumerate(images_bytes):
+        try:
+            image_rgb = preprocess_image(content)
+            decoded.append((i, image_rgb))
+        except Exception as e:
+            results[i] = e
+
+    if not decoded:
+        return results
+
+    images_rgb = [img for _, img in decoded]
+    with metrics.stage("detect"):
+        all_locations = _batch_face_locations(images_rgb)
+
+    with_faces = []
+    for (i, img), locs in zip(decoded, all_locations):
+        if not locs:
+            continue
+        try:
+            if quality_gate is not None:
+                with metrics.stage("quality"):
+                    quality_gate.check(img, locs[0])
+            with_faces.append((i, img, locs[0]))
+        except QualityRejected as e:
+            results[i] = e
+    if not with_faces:
+        logger.warning(f"No usable face in any of {len(decoded)} batched images")
+        return results
+
+    with metrics.stage("encode"):
+        encodings = _batch_face_encodings(
+            [img for _, img, _ in with_faces],
+            [loc for _, _, loc in with_faces]
+        )
+    for (i, _, _), encoding in zip(with_faces, encodings):
+        results[i] = encoding.tolist()
+
+    logger.info(
+        f"Batch encoded {len(with_faces)}/{len(images_bytes)} images "
+        f"(detector: {DETECTOR_BACKEND})")
+    return results
+
+
 def calculate_distance(embedding1: np.ndarray, embedding2: np.ndarray, metric: str = "euclidean") -> float:
     """
     Calculate distance between two embeddings
@@ -228,6 +938,188 @@ def calculate_distance(embedding1: np.ndarray, embedding2: np.ndarray, metric: s
         return np.linalg.norm(embedding1 - embedding2)
 
 
+# Settings that change the embedding produced for the same bytes
+ENCODING_SETTINGS = (DETECTOR_BACKEND, NUM_JITTERS, MAX_IMAGE_SIZE, DECODE_DOWNSCALE, DETECTION_SIZE,
+                     DETECTION_SIZE_UPSAMPLE, LANDMARK_MODEL, UPSAMPLE_POLICY, UPSAMPLE_TARGET_SIZE)
+
+
+def encode_cache_key(content: bytes, face_box: Optional[tuple] = None,
+                     pre_cropped: bool = False) -> tuple:
+    """
+    Encode cache key for an upload
+
+    Every endpoint builds its keys here, so the same unhinted bytes hit
+    the same entry whether they came through /encode, /encode-batch or
+    /verify-burst.
+
+    Args:
+        content: Raw image bytes
+        face_box: Client-detected (x, y, width, height), if any
+        pre_cropped: The image is a tight face crop
+    """
+    return content_key(content, ENCODING_SETTINGS + (face_box, pre_cropped))
+
+encode_cache = EncodingCache(
+    max_entries=ENCODE_CACHE_SIZE,
+    ttl_seconds=ENCODE_CACHE_TTL
+) if ENCODE_CACHE_SIZE > 0 else None
+
+encode_batcher = MicroBatcher(
+    encode_images_batch,
+    window_ms=BATCH_WINDOW_MS,
+    max_size=BATCH_MAX_SIZE,
+    runner=encode_pool.run if encode_pool else None
+) if ENCODE_BATCHING and DETECTOR_BACKEND == "cnn" else None
+if ENCODE_BATCHING and encode_batcher is None:
+    logger.warning(
+        f"ENCODE_BATCHING ignored: {DETECTOR_BACKEND} detection has no batched form, "
+        f"so /encode requests run per image in parallel instead")
+
+
+def json_or_binary_body(model) -> dict:
+    """
+    openapi_extra documenting a body read with read_request_model
+
+    Endpoints that take the raw Request lose their generated request
+    schema; this restores it, alongside the raw float32 alternative.
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": model.model_json_schema()},
+                wire.BINARY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}
+            }
+        }
+    }
+
+
+async def read_request_model(request: Request, model):
+    """
+    Parse a JSON request body into a pydantic model
+
+    Returns None when the body is raw float32 (application/octet-stream),
+    so the caller can read it with wire.from_bytes instead.
+    """
+    if wire.is_binary(request.headers.get("content-type")):
+        return None
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(payload, dict):
+        raise RequestValidationError([{
+            "loc": ("body",),
+            "msg": "expected object",
+            "type": "type_error",
+            "input": payload
+        }])
+    try:
+        return model(**payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+async def read_binary_embeddings(request: Request, dim: Optional[int] = None) -> np.ndarray:
+    """Read a raw float32 body as an (n, dim) matrix; dim from X-Embedding-Dim"""
+    if dim is None:
+        dim = int(request.headers.get("x-embedding-dim", gallery.dim))
+        if dim <= 0:
+            raise ValueError("X-Embedding-Dim must be positive")
+    return wire.from_bytes(await request.body(), dim)
+
+
+def embeddings_field(values, b64: Optional[str], name: str, dim: Optional[int] = None) -> np.ndarray:
+    """
+    Embedding matrix from a JSON field given as lists or as base64 float32
+
+    Args:
+        values: List of floats or list of lists (may be None)
+        b64: Base64 float32 alternative (may be None)
+        name: Field name used in error messages
+        dim: Embedding dimension required for base64 input (None = one vector)
+
+    Returns:
+        np.ndarray: (n, dim) float32 matrix
+    """
+    if b64:
+        return wire.from_b64(b64, dim)
+    if values:
+        matrix = np.asarray(values, dtype=np.float32)
+        return matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+    raise ValueError(f"{name} is required")
+
+
+async def read_probe(request: Request, model, data=None) -> np.ndarray:
+    """
+    Single gallery-sized probe embedding from a JSON or binary body
+
+    Args:
+        request: Incoming request
+        model: Pydantic model with new_embedding / new_embedding_b64 fields
+        data: Already-parsed body, if the caller needed other fields from it
+
+    Returns:
+        np.ndarray: float32 probe of shape (gallery.dim,)
+    """
+    if data is None:
+        data = await read_request_model(request, model)
+    if data is None:
+        matrix = await read_binary_embeddings(request, gallery.dim)
+    else:
+        matrix = embeddings_field(
+            data.new_embedding, data.new_embedding_b64, "new_embedding", dim=gallery.dim)
+    if len(matrix) != 1:
+        raise ValueError(f"Expected one probe embedding, got {len(matrix)}")
+    return as_embedding_matrix(matrix, gallery.dim)[0]
+
+
+def parse_face_box(face_box: str) -> tuple:
+    """Parse an 'x,y,width,height' form field (brackets allowed) or raise 400"""
+    try:
+        values = tuple(float(v) for v in face_box.strip("[]() ").split(","))
+    except ValueError:
+        values = ()
+    if len(values) != 4 or not all(np.isfinite(values)):
+        raise HTTPException(
+            status_code=400, detail="face_box must be 'x,y,width,height'")
+    return values
+
+
+def reference_templates(user_id: Optional[str], stored_embeddings_b64: Optional[str]) -> UserTemplates:
+    """
+    Templates to verify against: supplied embeddings, else the enrolled user's
+
+    Raises:
+        HTTPException: 400 for missing or invalid input, 404 if not enrolled
+    """
+    if stored_embeddings_b64:
+        try:
+            return UserTemplates(as_embedding_matrix(
+                wire.from_b64(stored_embeddings_b64, gallery.dim), gallery.dim))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if user_id:
+        templates = gallery.get(user_id)
+        if templates is None:
+            raise HTTPException(status_code=404, detail="User not enrolled")
+        return templates
+    raise HTTPException(status_code=400, detail="Provide user_id or stored_embeddings_b64")
+
+
+def embedding_response(embedding: List[float], request: Request, embedding_format: EmbeddingFormat):
+    """Encode a successful embedding per the client's Accept header / format"""
+    if wire.accepts_binary(request.headers.get("accept")):
+        return Response(
+            content=wire.to_bytes(embedding),
+            media_type=wire.BINARY_MEDIA_TYPE,
+            headers={"X-Embedding-Dim": str(len(embedding))}
+        )
+    if embedding_format == "base64":
+        return EncodingResponse(success=True, embedding_b64=wire.to_b64(embedding))
+    return EncodingResponse(success=True, embedding=embedding)
+
+
 # ================== API ENDPOINTS ==================
 
 @app.get("/")
@@ -240,8 +1132,15 @@ async def root():
         "optimization": "face_recognition library with preprocessing",
         "endpoints": {
             "encode": "/encode",
+            "encode_batch": "/encode-batch",
             "match": "/match",
-            "health": "/health"
+            "verify_burst": "/verify-burst",
+            "verify_stream": "/ws/verify",
+            "enroll": "/enroll/{user_id}",
+            "match_enrolled": "/match/{user_id}",
+            "identify": "/identify",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -257,17 +1156,88 @@ async def health_check():
         "distance_metric": DISTANCE_METRIC,
         "enforce_detection": ENFORCE_DETECTION,
         "max_image_size": MAX_IMAGE_SIZE,
-        "num_jitters": NUM_JITTERS
+        "detection_size": DETECTION_SIZE,
+        "num_jitters": NUM_JITTERS,
+        "landmark_model": LANDMARK_MODEL,
+        "upsample_policy": UPSAMPLE_POLICY,
+        "enrolled_users": len(gallery),
+        "gallery_store": GALLERY_DIR or "memory",
+        "template_max_exemplars": TEMPLATE_MAX_EXEMPLARS,
+        "template_update_on_match": TEMPLATE_UPDATE_ON_MATCH and gallery.max_exemplars > 0,
+        "identify_quantization": IDENTIFY_QUANTIZATION,
+        "quality_gate": quality_gate.stats() if quality_gate else None,
+        "encode_execution": ENCODE_EXECUTION,
+        "encode_pool": encode_pool.stats() if encode_pool else None,
+        "encode_batching": encode_batcher.stats() if encode_batcher else None,
+        "encode_cache": encode_cache.stats() if encode_cache else None
     }
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus text-format metrics
+
+    Stage and request latency histograms and request counters, plus
+    gauges and running totals read from the encode pool, cache, quality
+    gate and gallery at scrape time.
+    """
+    parts = [metrics.registry.render()]
+    parts.append(metrics.render_gauges(
+        "face_auth_enrolled_users", "Users in the gallery", [({}, len(gallery))]))
+    if encode_pool is not None:
+        pool = encode_pool.stats()
+        slabs = pool.pop("shared_memory")
+        parts.append(metrics.render_stats(
+            "face_auth_encode_pool", "Encode pool", pool,
+            gauges=("workers", "queue_size", "in_flight"),
+            totals=("completed", "rejected", "restarts")))
+        if slabs is not None:
+            parts.append(metrics.render_stats(
+                "face_auth_encode_shm", "Shared-memory slab pool", slabs,
+                gauges=("slabs", "free", "bytes", "max_bytes"),
+                totals=("created", "unlinked", "shared", "pickled_overflow")))
+    if encode_cache:
+        parts.append(metrics.render_stats(
+            "face_auth_encode_cache", "Encode cache", encode_cache.stats(),
+            gauges=("entries",), totals=("hits", "misses", "evictions")))
+    if quality_gate is not None:
+        quality = quality_gate.stats()
+        parts.append(metrics.render_counters(
+            "face_auth_quality_rejections_total", "Images rejected by the quality gate",
+            [({"reason": k}, v) for k, v in quality["rejected_by_reason"].items()]))
+    if encode_batcher is not None:
+        parts.append(metrics.render_stats(
+            "face_auth_encode_batches", "Micro-batcher", encode_batcher.stats(),
+            gauges=("largest_batch",), totals=("batches", "items")))
+    return Response(content="".join(parts), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/encode", response_model=EncodingResponse)
-async def encode_face(file: UploadFile = File(...)):
+async def encode_face(
+    request: Request,
+    file: UploadFile = File(...),
+    embedding_format: EmbeddingFormat = Query("json", description="'json' (float list) or 'base64' (float32)"),
+    face_box: Optional[str] = Form(None, description="Client-detected face as 'x,y,width,height' pixels"),
+    pre_cropped: bool = Form(False, description="The image is already a tight face crop")
+):
     """
     Encode a face from an uploaded image
 
+    Clients sending Accept: application/octet-stream get the embedding as
+    raw little-endian float32 bytes; failures are always JSON.
+
+    Clients that already located the face (face_box, or a pre-cropped
+    image) skip server-side detection; the box is checked against the
+    decoded image before use, and a malformed box or one that does not
+    fit the image gets a 400.
+
     Args:
+        request: Incoming request (for the Accept header)
         file: Uploaded image file containing a face
+        embedding_format: Embedding encoding in the JSON response
+        face_box: Optional 'x,y,width,height' face box in uploaded-image pixels
+        pre_cropped: Treat the whole image as the face box
 
     Returns:
         EncodingResponse: Success status and face embedding or error message
@@ -280,7 +1250,8 @@ async def encode_face(file: UploadFile = File(...)):
         logger.info(f"Processing face encoding for file: {file.filename}")
 
         # Read file content
-        content = await file.read()
+        with metrics.stage("read"):
+            content = await file.read()
         
         # Validate content
         if not content or len(content) == 0:
@@ -289,11 +1260,31 @@ async def encode_face(file: UploadFile = File(...)):
                 error="Empty file provided"
             )
 
-        # Preprocess image
-        image_rgb = preprocess_image(content)
+        box = parse_face_box(face_box) if face_box else None
+
+        # Identical bytes under identical settings give the same result
+        cache_key = encode_cache_key(content, box, pre_cropped)
+        embedding = encode_cache.get(cache_key) if encode_cache else MISS
+
+        if embedding is MISS:
+            # Preprocess image and generate embedding
+            if box is not None or pre_cropped:
+                # Located faces skip detection, so batching buys nothing
+                if encode_pool is not None:
+                    embedding = await encode_pool.run(encode_image_bytes, content, box, pre_cropped)
+                else:
+                    embedding = encode_image_bytes(content, box, pre_cropped)
+            elif encode_batcher is not None:
+                embedding = await encode_batcher.submit(content)
+            elif encode_pool is not None:
+                embedding = await encode_pool.run(encode_image_bytes, content)
+            else:
+                embedding = encode_image_bytes(content)
 
-        # Generate embedding
-        embedding = encode_face_optimized(image_rgb)
+            if quality_gate is not None:
+                quality_gate.record(embedding)
+            if encode_cache:
+                encode_cache.put(cache_key, embedding)
 
         if embedding is None:
             return EncodingResponse(
@@ -301,9 +1292,29 @@ async def encode_face(file: UploadFile = File(...)):
                 error="No face detected in the image"
             )
 
+        return embedding_response(embedding, request, embedding_format)
+
+    except HTTPException:
+        raise
+
+    except InvalidFaceBox as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except PoolUnavailable as e:
+        logger.warning(f"Rejecting encode request: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Encoder busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    except QualityRejected as e:
+        logger.info(f"Rejected by quality gate ({e.reason}): {file.filename}")
+        quality_gate.record(e)
         return EncodingResponse(
-            success=True,
-            embedding=embedding
+            success=False,
+            error=str(e),
+            rejection=QualityRejection(reason=e.reason, metrics=e.metrics)
         )
 
     except ValueError as e:
@@ -321,50 +1332,213 @@ async def encode_face(file: UploadFile = File(...)):
         )
 
 
-@app.post("/match", response_model=MatchResponse)
-async def match_faces(data: MatchRequest):
+async def _encode_many(contents: List[bytes]) -> List[Any]:
+    """Run encode_images_batch over many images, split across pool workers"""
+    if encode_pool is None:
+        # Inline mode: one executor job per image, so the images spread
+        # over the default thread pool instead of queueing on one thread
+        loop = asyncio.get_running_loop()
+        per_image = await asyncio.gather(*[
+            loop.run_in_executor(None, encode_images_batch, [content])
+            for content in contents
+        ])
+        return [result for (result,) in per_image]
+
+    # One job per worker keeps batched detection and uses at most
+    # max_workers slots of the bounded queue
+    n_chunks = min(len(contents), encode_pool.max_workers)
+    bounds = np.linspace(0, len(contents), n_chunks + 1).astype(int)
+    chunks = [contents[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    chunk_results = await asyncio.gather(
+        *[encode_pool.run(encode_images_batch, chunk) for chunk in chunks],
+        return_exceptions=True
+    )
+
+    results: List[Any] = []
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if isinstance(chunk_result, PoolUnavailable):
+            raise chunk_result
+        if isinstance(chunk_result, Exception):
+            chunk_result = [chunk_result] * len(chunk)
+        results.extend(chunk_result)
+    return results
+
+
+async def _encode_cached(contents: List[bytes]) -> List[Any]:
+    """
+    _encode_many behind the content-hash cache
+
+    Fresh results are counted by the quality gate and cached unless they
+    are errors.
+
+    Args:
+        contents: Non-empty image bytes
+
+    Returns:
+        List: Per image, the embedding, None or the Exception raised
+    """
+    results: List[Any] = [None] * len(contents)
+    cache_keys = [encode_cache_key(c) for c in contents]
+
+    to_encode = []
+    for i, key in enumerate(cache_keys):
+        cached = encode_cache.get(key) if encode_cache else MISS
+        if cached is MISS:
+            to_encode.append(i)
+        else:
+            results[i] = cached
+    if not to_encode:
+        return results
+
+    encoded = await _encode_many([contents[i] for i in to_encode])
+    for i, result in zip(to_encode, encoded):
+        results[i] = result
+        if quality_gate is not None:
+            quality_gate.record(result)
+        if encode_cache and not isinstance(result, Exception):
+            encode_cache.put(cache_keys[i], result)
+    return results
+
+
+@app.post("/encode-batch", response_model=BatchEncodingResponse)
+async def encode_face_batch(
+    files: List[UploadFile] = File(...),
+    template: bool = Query(False, description="Also return the averaged embedding"),
+    embedding_format: EmbeddingFormat = Query("json", description="'json' (float list) or 'base64' (float32)")
+):
+    """
+    Encode faces from several uploaded images in one request
+
+    Args:
+        files: Uploaded images, each containing a face
+        template: Also return the mean of the successful embeddings
+        embedding_format: Embedding encoding in the JSON response
+
+    Returns:
+        BatchEncodingResponse: Per-image embeddings or errors in input order
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    if len(files) > ENCODE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files ({len(files)}), maximum is {ENCODE_BATCH_MAX_FILES}")
+
+    with metrics.stage("read"):
+        contents = [await f.read() for f in files]
+    results: List[Any] = [None] * len(contents)
+
+    to_encode = [i for i, content in enumerate(contents) if content]
+    try:
+        encoded = await _encode_cached([contents[i] for i in to_encode])
+    except PoolUnavailable as e:
+        logger.warning(f"Rejecting encode-batch request: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Encoder busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    for i, result in zip(to_encode, encoded):
+        results[i] = result
+
+    items = []
+    embeddings = []
+    for i, (upload, content, result) in enumerate(zip(files, contents, results)):
+        item = BatchEncodingItem(index=i, filename=upload.filename, success=False)
+        if not content:
+            item.error = "Empty file provided"
+        elif isinstance(result, QualityRejected):
+            item.error = str(result)
+            item.rejection = QualityRejection(reason=result.reason, metrics=result.metrics)
+        elif isinstance(result, Exception):
+            item.error = f"Error processing image: {str(result)}"
+        elif result is None:
+            item.error = "No face detected in the image"
+        else:
+            item.success = True
+            if embedding_format == "base64":
+                item.embedding_b64 = wire.to_b64(result)
+            else:
+                item.embedding = result
+            embeddings.append(result)
+        items.append(item)
+
+    logger.info(f"Batch encoding: {len(embeddings)}/{len(files)} images encoded")
+
+    response = BatchEncodingResponse(
+        success=len(embeddings) > 0,
+        encoded=len(embeddings),
+        results=items
+    )
+    if template and embeddings:
+        mean = np.mean(embeddings, axis=0)
+        if embedding_format == "base64":
+            response.template_b64 = wire.to_b64(mean)
+        else:
+            response.template = mean.tolist()
+    return response
+
+
+@app.post("/match", response_model=MatchResponse, openapi_extra=json_or_binary_body(MatchRequest))
+async def match_faces(request: Request):
     """
     Match a new face embedding against stored embeddings
 
+    The body is either a JSON MatchRequest (embeddings as float lists or
+    base64 float32) or raw float32 (application/octet-stream): the new
+    embedding followed by the stored embeddings, with the dimension in
+    the X-Embedding-Dim header (default 128).
+
     Args:
-        data: MatchRequest containing new embedding and stored embeddings
+        request: Request carrying a MatchRequest or a binary payload
 
     Returns:
         MatchResponse: Match result and distance
     """
     try:
-        # Validate input
-        if not data.new_embedding:
-            raise HTTPException(
-                status_code=400, detail="new_embedding is required")
-
-        if not data.stored_embeddings or len(data.stored_embeddings) == 0:
-            raise HTTPException(
-                status_code=400, detail="stored_embeddings is required")
+        data = await read_request_model(request, MatchRequest)
 
         # Convert to numpy arrays
-        new_embedding = np.array(data.new_embedding)
-        stored_embeddings = np.array(data.stored_embeddings)
+        if data is None:
+            matrix = await read_binary_embeddings(request)
+            if len(matrix) < 2:
+                raise HTTPException(
+                    status_code=400, detail="stored_embeddings is required")
+            new_embedding, stored_embeddings = matrix[0], matrix[1:]
+        else:
+            # Validate input
+            try:
+                new_embedding = embeddings_field(
+                    data.new_embedding, data.new_embedding_b64, "new_embedding")[0]
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            try:
+                stored_embeddings = embeddings_field(
+                    data.stored_embeddings, data.stored_embeddings_b64,
+                    "stored_embeddings", dim=len(new_embedding))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
         logger.info(
-            f"Matching against {len(data.stored_embeddings)} stored embeddings")
+            f"Matching against {len(stored_embeddings)} stored embeddings")
 
         # Vectorized distance calculation (much faster than loop)
-        if DISTANCE_METRIC == "cosine":
-            # Vectorized cosine distance
-            dot_products = np.dot(stored_embeddings, new_embedding)
-            norms_stored = np.linalg.norm(stored_embeddings, axis=1)
-            norm_new = np.linalg.norm(new_embedding)
-
-            if norm_new > 0 and np.all(norms_stored > 0):
-                cosine_similarities = dot_products / (norms_stored * norm_new)
-                distances = 1 - cosine_similarities
+        with metrics.stage("match"):
+            if DISTANCE_METRIC == "cosine":
+                # Vectorized cosine distance
+                dot_products = np.dot(stored_embeddings, new_embedding)
+                norms_stored = np.linalg.norm(stored_embeddings, axis=1)
+                norm_new = np.linalg.norm(new_embedding)
+
+                if norm_new > 0 and np.all(norms_stored > 0):
+                    cosine_similarities = dot_products / (norms_stored * norm_new)
+                    distances = 1 - cosine_similarities
+                else:
+                    distances = np.full(len(stored_embeddings), 2.0)
             else:
-                distances = np.full(len(stored_embeddings), 2.0)
-        else:
-            # Vectorized Euclidean distance
-            distances = np.linalg.norm(
-                stored_embeddings - new_embedding, axis=1)
+                # Vectorized Euclidean distance
+                distances = np.linalg.norm(
+                    stored_embeddings - new_embedding, axis=1)
 
         # Find minimum distance
         min_distance = float(np.min(distances))
@@ -383,6 +1557,12 @@ async def match_faces(data: MatchRequest):
             distance=min_distance
         )
 
+    except (HTTPException, RequestValidationError):
+        raise
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     except Exception as e:
         logger.error(f"Error during face matching: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -391,6 +1571,391 @@ async def match_faces(data: MatchRequest):
         )
 
 
+@app.post("/enroll/{user_id}", response_model=EnrollResponse,
+          openapi_extra=json_or_binary_body(EnrollRequest))
+async def enroll_user(
+    user_id: str,
+    request: Request,
+    replace: bool = Query(False, description="Replace existing embeddings (binary bodies)")
+):
+    """
+    Store embeddings for a user in the server-side gallery
+
+    Args:
+        user_id: User identifier
+        request: Request carrying an EnrollRequest or raw float32 embeddings
+
+    Returns:
+        EnrollResponse: Stored exemplars and total observations for the user
+    """
+    data = await read_request_model(request, EnrollRequest)
+    try:
+        if data is None:
+            embeddings = await read_binary_embeddings(request, gallery.dim)
+        else:
+            embeddings = embeddings_field(
+                data.embeddings, data.embeddings_b64, "embeddings", dim=gallery.dim)
+            replace = data.replace
+        count = gallery.enroll(user_id, embeddings, replace=replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    templates = gallery.get(user_id)
+    return EnrollResponse(
+        user_id=user_id,
+        count=count,
+        observations=templates.observations if templates is not None else count
+    )
+
+
+@app.delete("/enroll/{user_id}")
+async def unenroll_user(user_id: str):
+    """Remove a user's embeddings from the server-side gallery"""
+    if not gallery.remove(user_id):
+        raise HTTPException(status_code=404, detail="User not enrolled")
+
+    return {"user_id": user_id, "removed": True}
+
+
+@app.post("/match/{user_id}", response_model=MatchResponse,
+          openapi_extra=json_or_binary_body(ProbeMatchRequest))
+async def match_enrolled(user_id: str, request: Request):
+    """
+    Match a new face embedding against a user's enrolled embeddings
+
+    Args:
+        user_id: User identifier
+        request: Request carrying a ProbeMatchRequest or a raw float32 probe
+
+    Returns:
+        MatchResponse: Match result and distance
+    """
+    templates = gallery.get(user_id)
+    if templates is None:
+        raise HTTPException(status_code=404, detail="User not enrolled")
+
+    try:
+        probe = await read_probe(request, ProbeMatchRequest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with metrics.stage("match"):
+        distances = template_distances(templates, probe, DISTANCE_METRIC)
+    min_idx = int(np.argmin(distances))
+    min_distance = float(distances[min_idx])
+    is_match = min_distance < MATCH_THRESHOLD
+
+    logger.info(
+        f"Match result for {user_id}: {is_match}, Min distance: {min_distance:.4f} "
+        f"(embedding {min_idx} of {len(templates)}), Threshold: {MATCH_THRESHOLD}"
+    )
+
+    if (TEMPLATE_UPDATE_ON_MATCH and gallery.max_exemplars > 0
+            and min_distance < min(TEMPLATE_UPDATE_THRESHOLD, MATCH_THRESHOLD)):
+        # Confident verification: refresh the consolidated template with it
+        await asyncio.get_running_loop().run_in_executor(None, gallery.enroll, user_id, probe)
+
+    return MatchResponse(
+        match=is_match,
+        distance=min_distance
+    )
+
+
+@app.post("/verify-burst", response_model=VerifyBurstResponse)
+async def verify_burst(
+    files: List[UploadFile] = File(...),
+    user_id: Optional[str] = Form(None, description="Enrolled user to verify against"),
+    stored_embeddings_b64: Optional[str] = Form(None, description="Base64 float32 embeddings, if not enrolled"),
+    required_matches: Optional[int] = Query(
+        None, ge=1, description="Matching frames needed to accept "
+                                "(default BURST_REQUIRED_MATCHES, capped at the frames sent)"),
+    parallelism: int = Query(0, ge=0, description="Frames encoded at once (0 = one per pool worker)")
+):
+    """
+    Verify a user from a short burst of frames, stopping as soon as the
+    outcome is decided
+
+    Frames are encoded in order, `parallelism` at a time. The burst is
+    accepted once required_matches frames fall under MATCH_THRESHOLD and
+    rejected once too few frames remain to get there; the remaining
+    frames are never decoded.
+
+    Args:
+        files: Frames in capture order
+        user_id: Enrolled user to verify against
+        stored_embeddings_b64: Reference embeddings when the user is not enrolled
+        required_matches: Matching frames needed for a positive decision;
+            when omitted, BURST_REQUIRED_MATCHES capped at the frame count
+        parallelism: Frames encoded per step
+
+    Returns:
+        VerifyBurstResponse: Decision, best distance and per-frame outcomes
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    if len(files) > BURST_MAX_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many frames ({len(files)}), maximum is {BURST_MAX_FRAMES}")
+    if required_matches is None:
+        # A single-frame burst is a plain verification
+        required_matches = min(BURST_REQUIRED_MATCHES, len(files))
+    elif required_matches > len(files):
+        raise HTTPException(
+            status_code=400,
+            detail=f"required_matches ({required_matches}) exceeds the {len(files)} frames sent")
+
+    templates = reference_templates(user_id, stored_embeddings_b64)
+
+    if parallelism == 0:
+        parallelism = encode_pool.max_workers if encode_pool else 1
+
+    frames: List[BurstFrameResult] = []
+    matched = 0
+    best_distance = None
+    for start in range(0, len(files), parallelism):
+        step = files[start:start + parallelism]
+        with metrics.stage("read"):
+            contents = [await f.read() for f in step]
+        non_empty = [i for i, content in enumerate(contents) if content]
+        try:
+            encoded = await _encode_cached([contents[i] for i in non_empty])
+        except PoolUnavailable as e:
+            logger.warning(f"Rejecting verify-burst request: {str(e)}")
+            raise HTTPException(
+                status_code=503,
+                detail="Encoder busy, retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        results: List[Any] = [None] * len(step)
+        for i, result in zip(non_empty, encoded):
+            results[i] = result
+
+        for offset, (content, result) in enumerate(zip(contents, results)):
+            frame = BurstFrameResult(index=start + offset, success=False)
+            if not content:
+                frame.error = "Empty file provided"
+            elif isinstance(result, Exception):
+                frame.error = str(result) if isinstance(result, QualityRejected) \
+                    else f"Error processing image: {str(result)}"
+            elif result is None:
+                frame.error = "No face detected in the image"
+            else:
+                probe = np.asarray(result, dtype=np.float32)
+                with metrics.stage("match"):
+                    distance = float(np.min(template_distances(templates, probe, DISTANCE_METRIC)))
+                frame.success = True
+                frame.distance = distance
+                frame.match = distance < MATCH_THRESHOLD
+                matched += frame.match
+                if best_distance is None or distance < best_distance:
+                    best_distance = distance
+            frames.append(frame)
+
+        # Stop once accepted, or once the remaining frames cannot get there
+        remaining = len(files) - len(frames)
+        if matched >= required_matches or matched + remaining < required_matches:
+            break
+
+    is_match = matched >= required_matches
+    logger.info(
+        f"Burst verification for {user_id or 'supplied embeddings'}: {is_match}, "
+        f"{matched}/{len(frames)} frames matched ({len(files)} received), "
+        f"best distance: {best_distance}")
+
+    return VerifyBurstResponse(
+        match=is_match,
+        distance=best_distance,
+        frames_received=len(files),
+        frames_processed=len(frames),
+        frames_matched=matched,
+        required_matches=required_matches,
+        frames=frames
+    )
+
+
+async def _encode_stream_frame(content: bytes) -> Optional[List[float]]:
+    """Encode one streamed frame off the event loop"""
+    if encode_batcher is not None:
+        return await encode_batcher.submit(content)
+    if encode_pool is not None:
+        return await encode_pool.run(encode_image_bytes, content)
+    # Even inline mode must not block: the receiver keeps reading (and
+    # dropping stale frames) while this frame is encoded
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, encode_image_bytes, content)
+
+
+async def _verify_stream_frame(content: bytes, templates: UserTemplates) -> Dict[str, Any]:
+    """Encode a frame and match it; the result event without sequence info"""
+    event: Dict[str, Any] = {"success": False, "match": False}
+    if len(content) > STREAM_MAX_FRAME_BYTES:
+        event["error"] = f"Frame larger than {STREAM_MAX_FRAME_BYTES} bytes"
+        return event
+
+    try:
+        embedding = await _encode_stream_frame(content)
+    except QualityRejected as e:
+        quality_gate.record(e)
+        event["error"] = str(e)
+        event["rejection"] = {"reason": e.reason, "metrics": e.metrics}
+        return event
+    except PoolUnavailable:
+        event["error"] = "Encoder busy"
+        return event
+    except Exception as e:
+        event["error"] = f"Error processing image: {str(e)}"
+        return event
+
+    if quality_gate is not None:
+        quality_gate.record(embedding)
+    if embedding is None:
+        event["error"] = "No face detected in the image"
+        return event
+
+    probe = np.asarray(embedding, dtype=np.float32)
+    with metrics.stage("match"):
+        distance = float(np.min(template_distances(templates, probe, DISTANCE_METRIC)))
+    event.update(success=True, match=distance < MATCH_THRESHOLD, distance=distance)
+    return event
+
+
+metrics.registry.describe("face_auth_stream_frames_total", "Frames received on /ws/verify by outcome")
+
+
+@app.websocket("/ws/verify")
+async def verify_stream(websocket: WebSocket):
+    """
+    Continuous authentication over a WebSocket
+
+    Protocol:
+        1. Client sends a JSON hello: {"user_id": ...} for an enrolled
+           user, or {"stored_embeddings_b64": ...}. The server loads the
+           templates once for the connection and replies
+           {"type": "ready", "templates": n}.
+        2. Client sends frames as binary messages (encoded images) at a
+           low rate. For each frame it processes, the server pushes
+           {"type": "result", "frame": seq, "success", "match",
+           "distance", "error", "latency_ms", "dropped"}; seq counts
+           received frames from 0.
+
+    Frames are processed one at a time, newest first: a frame still
+    waiting when a newer one arrives is dropped, so results never lag
+    behind the camera. "dropped" is the running count of such frames.
+    """
+    await websocket.accept()
+    try:
+        hello = await websocket.receive_json()
+        templates = reference_templates(hello.get("user_id"), hello.get("stored_embeddings_b64"))
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "error": e.detail})
+        await websocket.close(code=1008)
+        return
+    except (ValueError, KeyError, AttributeError):
+        await websocket.send_json({"type": "error", "error": "First message must be a JSON hello"})
+        await websocket.close(code=1003)
+        return
+
+    await websocket.send_json({"type": "ready", "templates": len(templates)})
+    logger.info(f"Stream verification started for {hello.get('user_id') or 'supplied embeddings'}")
+
+    mailbox = LatestFrame()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is None:
+                    continue
+                if mailbox.put((mailbox.received, time.perf_counter(), message["bytes"])):
+                    metrics.registry.inc("face_auth_stream_frames_total", outcome="dropped")
+        finally:
+            mailbox.close()
+
+    receiver = asyncio.create_task(receive_frames())
+    processed = 0
+    try:
+        while True:
+            frame = await mailbox.get()
+            if frame is None:
+                break
+            seq, received_at, content = frame
+            event = await _verify_stream_frame(content, templates)
+            processed += 1
+            metrics.registry.inc("face_auth_stream_frames_total", outcome="processed")
+            event.update(
+                type="result",
+                frame=seq,
+                latency_ms=round((time.perf_counter() - received_at) * 1000.0, 1),
+                dropped=mailbox.dropped
+            )
+            await websocket.send_json(event)
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away mid-send
+        pass
+    finally:
+        receiver.cancel()
+        logger.info(
+            f"Stream verification ended: {processed} frames processed, "
+            f"{mailbox.dropped} dropped of {mailbox.received}")
+
+
+@app.post("/identify", response_model=IdentifyResponse,
+          openapi_extra=json_or_binary_body(IdentifyRequest))
+async def identify_face(
+    request: Request,
+    top_k: Optional[int] = Query(None, description="Candidates to return (binary bodies)")
+):
+    """
+    Find the closest enrolled users to a face embedding (1:N search)
+
+    Args:
+        request: Request carrying an IdentifyRequest or a raw float32 probe
+        top_k: Number of candidates when the body is binary
+
+    Returns:
+        IdentifyResponse: Best match (if under threshold) and top-k candidates
+    """
+    data = await read_request_model(request, IdentifyRequest)
+    try:
+        probe = await read_probe(request, IdentifyRequest, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if data is not None and data.top_k is not None:
+        top_k = data.top_k
+    if top_k is None:
+        top_k = IDENTIFY_TOP_K
+    if top_k <= 0:
+        raise HTTPException(status_code=400, detail="top_k must be positive")
+
+    # Searches (and the first index build) run off the event loop
+    with metrics.stage("identify"):
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, identify_index.search, probe, top_k, DISTANCE_METRIC)
+    candidates = [
+        IdentifyCandidate(user_id=user_id, distance=distance,
+                          match=distance < MATCH_THRESHOLD)
+        for user_id, distance in results
+    ]
+    best = candidates[0] if candidates and candidates[0].match else None
+
+    logger.info(
+        f"Identify result: {best.user_id if best else None}, "
+        f"{len(candidates)} candidates from {len(identify_index)} embeddings"
+    )
+
+    return IdentifyResponse(
+        match=best is not None,
+        user_id=best.user_id if best else None,
+        candidates=candidates
+    )
+
+
 # ================== DEBUG ENDPOINT ==================
 
 @app.post("/debug-image")
@@ -425,7 +1990,8 @@ async def debug_image(file: UploadFile = File(...)):
             "pil_mode": pil_img.mode,
             "pil_size": pil_img.size,
             "pil_format": pil_img.format,
-            "preprocessed_info": str(preprocessed.shape) if isinstance(preprocessed, np.ndarray) else preprocessed
+            "preprocessed_info": str(preprocessed.shape) if isinstance(preprocessed, np.ndarray) else preprocessed,
+            "quality_metrics": image_metrics(preprocessed) if isinstance(preprocessed, np.ndarray) else None
         }
     except Exception as e:
         return {"error": str(e)}
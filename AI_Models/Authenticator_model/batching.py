@@ -0,0 +1,115 @@
+"""
+Micro-batching scheduler for concurrent encode requests.
+
+Requests that arrive within a short window are gathered into one batch
+(up to a maximum size), run through a batch function in one go, and the
+per-item results are fanned back out to the waiting callers.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Gather concurrent submissions into batches
+
+    batch_fn receives a list of items and must return a list of the same
+    length; an Exception instance in the result list is raised to that
+    item's caller only. By default batch_fn runs on a dedicated thread so
+    the event loop keeps serving requests while a batch is processed;
+    pass runner to execute it elsewhere (e.g. in the encode process pool).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 window_ms: float = 10.0, max_size: int = 16,
+                 runner: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.batch_fn = batch_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_size = max(1, max_size)
+        self._runner = runner
+        self._thread = None if runner else ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="encode-batch")
+        self._pending: List[Any] = []
+        self._futures: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item for the next batch and wait for its result
+
+        Args:
+            item: Input passed to batch_fn as part of a list
+
+        Returns:
+            Any: The item's entry from batch_fn's result list
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(item)
+        self._futures.append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        items, futures = self._pending, self._futures
+        self._pending, self._futures = [], []
+        asyncio.get_running_loop().create_task(self._run_batch(items, futures))
+
+    async def _run_batch(self, items: List[Any], futures: List[asyncio.Future]):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(items)
+            self._largest = max(self._largest, len(items))
+
+        try:
+            if self._runner is not None:
+                results = await self._runner(self.batch_fn, items)
+            else:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self._thread, self.batch_fn, items)
+        except Exception as e:
+            # The whole batch failed (e.g. pool saturated); every caller sees it
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_size": self.max_size,
+                "batches": self._batches,
+                "items": self._items,
+                "largest_batch": self._largest,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0
+            }
@@ -0,0 +1,92 @@
+"""
+Throughput and latency of /encode in single vs micro-batch mode.
+
+Fires bursts of concurrent /encode requests at the app in-process (ASGI
+transport) and reports requests/sec and p50/p99 latency per mode.
+
+    python benchmarks/bench_batching.py --concurrency 40 --rounds 3
+"""
+
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (puts the service on sys.path)
+from common import emit, load_corpus, summarize
+
+import httpx
+
+import app as service
+from batching import MicroBatcher
+
+
+async def _burst(client, images, concurrency):
+    latencies = []
+
+    async def one(i):
+        content = images[i % len(images)]["bytes"]
+        start = time.perf_counter()
+        response = await client.post("/encode", files={"file": ("frame.jpg", content, "image/jpeg")})
+        latencies.append(time.perf_counter() - start)
+        return response.status_code
+
+    statuses = await asyncio.gather(*[one(i) for i in range(concurrency)])
+    return latencies, statuses
+
+
+async def run_mode(mode, images, concurrency, rounds, window_ms, max_size):
+    if mode == "batch":
+        service.encode_batcher = MicroBatcher(
+            service.encode_images_batch,
+            window_ms=window_ms,
+            max_size=max_size,
+            runner=service.encode_pool.run if service.encode_pool else None
+        )
+    else:
+        service.encode_batcher = None
+
+    transport = httpx.ASGITransport(app=service.app)
+    latencies, errors = [], 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            burst, statuses = await _burst(client, images, concurrency)
+            latencies.extend(burst)
+            errors += sum(1 for s in statuses if s != 200)
+        elapsed = time.perf_counter() - start
+
+    report = summarize(latencies)
+    report["requests_per_sec"] = round(len(latencies) / elapsed, 2)
+    report["errors"] = errors
+    if service.encode_batcher is not None:
+        report["batching"] = service.encode_batcher.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Folder of real face photos (default: synthetic corpus)")
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--window-ms", type=float, default=service.BATCH_WINDOW_MS)
+    parser.add_argument("--max-size", type=int, default=service.BATCH_MAX_SIZE)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    images = load_corpus(args.images, sizes=((640, 480),), per_size=8)
+    report = {
+        "detector": service.DETECTOR_BACKEND,
+        "encode_execution": service.ENCODE_EXECUTION,
+        "concurrency": args.concurrency,
+        "rounds": args.rounds,
+        "modes": {}
+    }
+    for mode in ("single", "batch"):
+        report["modes"][mode] = asyncio.run(run_mode(
+            mode, images, args.concurrency, args.rounds, args.window_ms, args.max_size))
+
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Decode cost of preprocess_image with and without decode-time downscaling.
+
+Times preprocess_image on large synthetic JPEGs (4K and 12MP by default)
+with DECODE_DOWNSCALE off (full decode, then resize) and on (libjpeg
+reduced decode, then resize), and reports the size of the buffer the
+decoder has to fill in each case.
+
+    python benchmarks/bench_decode.py --repeat 20
+    python benchmarks/bench_decode.py --image face.jpg   # real photo, resized to each size
+"""
+
+import argparse
+import logging
+import time
+
+import common  # noqa: F401  (puts the service on sys.path)
+from common import emit, encode_image, summarize, synthetic_image
+
+import cv2
+import numpy as np
+
+import app as service
+
+SIZES = {
+    "4k": (3840, 2160),
+    "12mp": (4032, 3024),
+}
+
+
+def bench_size(content, repeat):
+    report = {}
+    for mode, enabled in (("full_decode", False), ("reduced_decode", True)):
+        service.DECODE_DOWNSCALE = enabled
+        flag, scale = service.reduced_decode_flag(content)
+        decoded = cv2.imdecode(np.frombuffer(content, np.uint8), flag)
+
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = service.preprocess_image(content)
+            samples.append(time.perf_counter() - start)
+
+        report[mode] = summarize(samples)
+        report[mode]["decode_scale"] = scale
+        report[mode]["decode_buffer_mb"] = round(decoded.nbytes / 2 ** 20, 2)
+        report[mode]["output_shape"] = list(output.shape)
+
+    full = report["full_decode"]["p50_ms"]
+    reduced = report["reduced_decode"]["p50_ms"]
+    report["speedup_p50"] = round(full / reduced, 2) if reduced else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--quality", type=int, default=90, help="JPEG quality of the test images")
+    parser.add_argument("--image", help="Photo to resize to each size (default: synthetic image); "
+                                        "real detail makes the full decode costlier")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Per-image log lines would dominate the timings
+    logging.getLogger(service.__name__).setLevel(logging.WARNING)
+
+    source = cv2.imread(args.image) if args.image else None
+    if args.image and source is None:
+        parser.error(f"Could not read {args.image}")
+
+    report = {"max_image_size": service.MAX_IMAGE_SIZE, "image": args.image or "synthetic", "sizes": {}}
+    for name, (width, height) in SIZES.items():
+        if source is None:
+            image = synthetic_image(width, height)
+        else:
+            image = cv2.resize(source, (width, height), interpolation=cv2.INTER_CUBIC)
+        content = encode_image(image, ".jpg", args.quality)
+        report["sizes"][name] = bench_size(content, args.repeat)
+        report["sizes"][name]["input_bytes"] = len(content)
+
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
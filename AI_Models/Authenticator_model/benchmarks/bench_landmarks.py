@@ -0,0 +1,151 @@
+"""
+Accuracy versus latency of landmark model and detector upsampling settings.
+
+Runs the full encode pipeline (encode_image_bytes) over a local labelled
+image set for every combination of LANDMARK_MODEL and UPSAMPLE_POLICY,
+then scores all image pairs at MATCH_THRESHOLD. The dataset is a folder
+with one sub-folder per person:
+
+    faces/
+        alice/  1.jpg 2.jpg ...
+        bob/    1.jpg ...
+
+    python benchmarks/bench_landmarks.py faces --models large,small --upsample 0,1,adaptive
+
+Synthetic images contain no real faces, so this benchmark needs a real
+dataset. The quality gate is disabled so every setting sees every image.
+"""
+
+import argparse
+import logging
+import os
+import time
+from itertools import product
+
+import common  # noqa: F401  (puts the service on sys.path)
+from common import emit, summarize
+
+import numpy as np
+
+import app as service
+
+
+def load_labelled(dataset_dir):
+    """[(label, name, bytes)] for every image in per-person sub-folders"""
+    items = []
+    for label in sorted(os.listdir(dataset_dir)):
+        person_dir = os.path.join(dataset_dir, label)
+        if not os.path.isdir(person_dir):
+            continue
+        for name in sorted(os.listdir(person_dir)):
+            path = os.path.join(person_dir, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    items.append((label, f"{label}/{name}", f.read()))
+    if len({label for label, _, _ in items}) < 2:
+        raise ValueError(f"{dataset_dir} needs images of at least two people")
+    return items
+
+
+def pair_distances(embeddings, labels, metric):
+    """Distances of all same-person and different-person pairs"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if metric == "cosine":
+        unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        dist = 1 - unit @ unit.T
+    else:
+        sq = np.einsum("ij,ij->i", matrix, matrix)
+        dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * matrix @ matrix.T, 0))
+
+    labels = np.asarray(labels)
+    upper = np.triu_indices(len(labels), k=1)
+    same = labels[upper[0]] == labels[upper[1]]
+    pairs = dist[upper]
+    return pairs[same], pairs[~same]
+
+
+def verification_report(genuine, impostor, threshold):
+    """Accept rates at the service threshold plus the equal error rate"""
+    report = {
+        "genuine_pairs": int(len(genuine)),
+        "impostor_pairs": int(len(impostor)),
+        "true_accept_rate": round(float(np.mean(genuine <= threshold)), 4) if len(genuine) else None,
+        "false_accept_rate": round(float(np.mean(impostor <= threshold)), 4) if len(impostor) else None,
+    }
+    if len(genuine) and len(impostor):
+        thresholds = np.unique(np.concatenate([genuine, impostor]))
+        far = np.searchsorted(np.sort(impostor), thresholds, side="right") / len(impostor)
+        frr = 1 - np.searchsorted(np.sort(genuine), thresholds, side="right") / len(genuine)
+        best = int(np.argmin(np.abs(far - frr)))
+        report["equal_error_rate"] = round(float((far[best] + frr[best]) / 2), 4)
+        report["eer_threshold"] = round(float(thresholds[best]), 4)
+    return report
+
+
+def bench_setting(items, landmark_model, upsample_policy, warmup):
+    service.LANDMARK_MODEL = landmark_model
+    service.UPSAMPLE_POLICY = upsample_policy
+
+    for _, _, content in items[:warmup]:
+        service.encode_image_bytes(content)
+
+    samples, embeddings, labels, failed = [], [], [], []
+    for label, name, content in items:
+        start = time.perf_counter()
+        try:
+            embedding = service.encode_image_bytes(content)
+        except Exception:
+            embedding = None
+        samples.append(time.perf_counter() - start)
+        if embedding is None:
+            failed.append(name)
+        else:
+            embeddings.append(embedding)
+            labels.append(label)
+
+    report = {
+        "latency": summarize(samples),
+        "images_per_sec": round(len(samples) / sum(samples), 2) if samples else 0.0,
+        "encoded": len(embeddings),
+        "detection_rate": round(len(embeddings) / len(items), 4),
+        "failed": failed,
+    }
+    if len(embeddings) >= 2:
+        genuine, impostor = pair_distances(embeddings, labels, service.DISTANCE_METRIC)
+        report["verification"] = verification_report(genuine, impostor, service.MATCH_THRESHOLD)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dataset", help="Folder with one sub-folder of images per person")
+    parser.add_argument("--models", default="large,small", help="Landmark models to compare")
+    parser.add_argument("--upsample", default="0,1,adaptive", help="Upsample policies to compare")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed images per setting")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Per-image log lines would dominate the timings
+    logging.getLogger(service.__name__).setLevel(logging.WARNING)
+    service.quality_gate = None
+
+    items = load_labelled(args.dataset)
+    report = {
+        "images": len(items),
+        "people": len({label for label, _, _ in items}),
+        "detector": service.DETECTOR_BACKEND,
+        "distance_metric": service.DISTANCE_METRIC,
+        "threshold": service.MATCH_THRESHOLD,
+        "max_image_size": service.MAX_IMAGE_SIZE,
+        "upsample_target_size": service.UPSAMPLE_TARGET_SIZE,
+        "settings": {},
+    }
+    for model, policy in product(args.models.split(","), args.upsample.split(",")):
+        report["settings"][f"{model}/upsample={policy}"] = bench_setting(
+            items, model.strip(), policy.strip(), args.warmup)
+
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+End-to-end benchmark of the encode pipeline, for comparing configs and commits.
+
+Runs a generated corpus (several sizes and formats) through:
+  * functions: preprocess_image and encode_face_optimized called directly
+  * api: POST /encode against the app in-process (ASGI transport), first
+    one request at a time for a per-stage breakdown, then with
+    --concurrency requests in flight for throughput
+
+Per-stage timings come from the service's own stage timers (see
+metrics.py), drained after every call, so they match what /metrics
+reports in production. The JSON report carries the config, the git
+commit, images/sec, p50/p99 per stage and peak RSS.
+
+    python benchmarks/bench_pipeline.py --repeat 3 --output before.json
+    DETECTOR_BACKEND=cnn python benchmarks/bench_pipeline.py --output after.json
+    python benchmarks/bench_pipeline.py --max-image-size 640 --jitters 1
+
+The encode cache and quality gate are disabled so every request does
+the full amount of work (synthetic images are smooth enough to fail
+the sharpness check); pass --quality-gate to keep the gate.
+"""
+
+import argparse
+import asyncio
+import logging
+import subprocess
+import time
+from collections import defaultdict
+
+import common  # noqa: F401  (puts the service on sys.path)
+from common import SERVICE_DIR, emit, load_corpus, peak_rss_mb, summarize
+
+import httpx
+
+import app as service
+import metrics
+
+SIZES = ((640, 480), (1280, 720), (1920, 1080), (4032, 3024))
+FORMATS = (".jpg", ".png", ".webp")
+MEDIA_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def drained_stages():
+    """Seconds per stage recorded since the last call"""
+    recorded = metrics.registry.drain()["histograms"].get(metrics.STAGE_METRIC, {})
+    return {dict(key)["stage"]: cells[-1] for key, cells in recorded.items()}
+
+
+class StageSamples:
+    """Per-group lists of durations, keyed by stage"""
+
+    def __init__(self):
+        self.groups = defaultdict(lambda: defaultdict(list))
+
+    def add(self, group, stages):
+        for stage, seconds in stages.items():
+            self.groups[group][stage].append(seconds)
+            self.groups["all"][stage].append(seconds)
+
+    def report(self, total_stage):
+        report = {}
+        for group, stages in sorted(self.groups.items()):
+            totals = stages[total_stage]
+            report[group] = {
+                "images_per_sec": round(len(totals) / sum(totals), 2) if totals else 0.0,
+                "stages": {stage: summarize(samples) for stage, samples in sorted(stages.items())}
+            }
+        return report
+
+
+def bench_functions(corpus, repeat):
+    samples = StageSamples()
+    faces = 0
+    for item in corpus:
+        for _ in range(repeat):
+            drained_stages()
+            start = time.perf_counter()
+            image = service.preprocess_image(item["bytes"])
+            decoded = time.perf_counter()
+            embedding = service.encode_face_optimized(image)
+            done = time.perf_counter()
+
+            stages = drained_stages()
+            stages["preprocess_image"] = decoded - start
+            stages["encode_face_optimized"] = done - decoded
+            stages["total"] = done - start
+            samples.add(item["group"], stages)
+            faces += embedding is not None
+
+    report = {"groups": samples.report("total"), "faces_found": faces}
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _upload(item):
+    ext = "." + item["group"].rsplit(".", 1)[-1] if "." in item["group"] else ".jpg"
+    return {"file": (item["name"], item["bytes"], MEDIA_TYPES.get(ext, "application/octet-stream"))}
+
+
+async def bench_api(corpus, repeat, concurrency):
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Sequential: one request at a time so drained stages belong to it
+        samples = StageSamples()
+        errors = 0
+        for item in corpus:
+            for _ in range(repeat):
+                drained_stages()
+                start = time.perf_counter()
+                response = await client.post("/encode", files=_upload(item))
+                stages = drained_stages()
+                stages["request"] = time.perf_counter() - start
+                samples.add(item["group"], stages)
+                errors += response.status_code != 200
+
+        # Concurrent: throughput and latency under load
+        latencies = []
+
+        async def one(i):
+            item = corpus[i % len(corpus)]
+            start = time.perf_counter()
+            response = await client.post("/encode", files=_upload(item))
+            latencies.append(time.perf_counter() - start)
+            return response.status_code
+
+        total = len(corpus) * repeat
+        start = time.perf_counter()
+        statuses = []
+        for offset in range(0, total, concurrency):
+            statuses += await asyncio.gather(
+                *[one(i) for i in range(offset, min(offset + concurrency, total))])
+        elapsed = time.perf_counter() - start
+        drained_stages()
+
+    concurrent = summarize(latencies)
+    concurrent["concurrency"] = concurrency
+    concurrent["requests_per_sec"] = round(len(latencies) / elapsed, 2)
+    concurrent["errors"] = sum(1 for s in statuses if s != 200)
+    return {
+        "sequential": {"groups": samples.report("request"), "errors": errors},
+        "concurrent": concurrent,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Folder of real face photos (default: synthetic corpus)")
+    parser.add_argument("--sizes", default=",".join(f"{w}x{h}" for w, h in SIZES),
+                        help="Synthetic sizes, e.g. 640x480,1920x1080")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Synthetic formats")
+    parser.add_argument("--per-size", type=int, default=2, help="Synthetic images per size/format")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--detector", help="Override DETECTOR_BACKEND")
+    parser.add_argument("--jitters", type=int, help="Override NUM_JITTERS")
+    parser.add_argument("--max-image-size", type=int, help="Override MAX_IMAGE_SIZE")
+    parser.add_argument("--quality-gate", action="store_true", help="Keep the quality gate on")
+    parser.add_argument("--skip-api", action="store_true", help="Only benchmark the functions")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Per-image log lines would dominate the timings
+    logging.getLogger(service.__name__).setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.detector:
+        service.DETECTOR_BACKEND = args.detector
+    if args.jitters is not None:
+        service.NUM_JITTERS = args.jitters
+    if args.max_image_size:
+        service.MAX_IMAGE_SIZE = args.max_image_size
+    service.encode_cache = None
+    if not args.quality_gate:
+        service.quality_gate = None
+
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes.split(",")]
+    corpus = load_corpus(args.images, sizes=sizes, formats=args.formats.split(","),
+                         per_size=args.per_size)
+
+    report = {
+        "git_commit": git_commit(),
+        "config": {
+            "detector": service.DETECTOR_BACKEND,
+            "num_jitters": service.NUM_JITTERS,
+            "max_image_size": service.MAX_IMAGE_SIZE,
+            "decode_downscale": service.DECODE_DOWNSCALE,
+            "detection_size": service.DETECTION_SIZE,
+            "landmark_model": service.LANDMARK_MODEL,
+            "upsample_policy": service.UPSAMPLE_POLICY,
+            "encode_execution": service.ENCODE_EXECUTION,
+            "quality_gate": service.quality_gate is not None,
+        },
+        "corpus": {"images": len(corpus), "bytes": sum(len(item["bytes"]) for item in corpus)},
+        "repeat": args.repeat,
+        "peak_rss_mb_start": peak_rss_mb(),
+    }
+    report["functions"] = bench_functions(corpus, args.repeat)
+    if not args.skip_api:
+        report["api"] = asyncio.run(bench_api(corpus, args.repeat, args.concurrency))
+
+    emit(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
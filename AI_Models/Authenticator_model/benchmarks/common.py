@@ -0,0 +1,118 @@
+"""
+Shared helpers for the authenticator benchmarks.
+
+Benchmarks import the service modules directly, so run them from any
+directory: the Authenticator_model folder is put on sys.path here.
+"""
+
+import glob
+import json
+import os
+import resource
+import sys
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+
+def percentile_ms(samples: Sequence[float], q: float) -> float:
+    """q-th percentile of a list of durations in seconds, in milliseconds"""
+    if not samples:
+        return 0.0
+    return round(float(np.percentile(np.asarray(samples), q)) * 1000.0, 3)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """p50/p99/mean (ms) of a list of durations in seconds"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile_ms(samples, 50),
+        "p99_ms": percentile_ms(samples, 99),
+        "mean_ms": round(float(np.mean(samples)) * 1000.0, 3) if samples else 0.0
+    }
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    Smooth random BGR image with a face-like blob
+
+    Synthetic images rarely contain a detectable face, so they measure
+    decode and detection cost; use --images with real photos to include
+    the encoding stage.
+    """
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (max(2, height // 32), max(2, width // 32), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    center = (width // 2, height // 2)
+    axes = (max(1, width // 6), max(1, height // 4))
+    cv2.ellipse(image, center, axes, 0, 0, 360, (150, 170, 200), -1)
+    return image
+
+
+def encode_image(image: np.ndarray, fmt: str = ".jpg", quality: int = 90) -> bytes:
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if fmt == ".jpg" else []
+    ok, buf = cv2.imencode(fmt, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode synthetic image as {fmt}")
+    return buf.tobytes()
+
+
+def load_corpus(image_dir: str = None, sizes: Sequence[tuple] = ((640, 480),),
+                formats: Sequence[str] = (".jpg",), per_size: int = 4) -> List[Dict]:
+    """
+    Image corpus as a list of {"name", "group", "bytes"} dicts
+
+    group is "<width>x<height><format>" for synthetic images and the file
+    extension for real ones, so results can be broken down by both.
+
+    Args:
+        image_dir: Folder of real images; if None a synthetic corpus is built
+        sizes: (width, height) of synthetic images
+        formats: Encodings of synthetic images (".jpg", ".png", ".webp")
+        per_size: Synthetic images per size/format combination
+    """
+    if image_dir:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(image_dir, "*"))):
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    corpus.append({
+                        "name": os.path.basename(path),
+                        "group": os.path.splitext(path)[1].lower() or "other",
+                        "bytes": f.read()
+                    })
+        if not corpus:
+            raise ValueError(f"No images found in {image_dir}")
+        return corpus
+
+    corpus = []
+    for width, height in sizes:
+        for fmt in formats:
+            for i in range(per_size):
+                corpus.append({
+                    "name": f"synthetic_{width}x{height}_{i}{fmt}",
+                    "group": f"{width}x{height}{fmt}",
+                    "bytes": encode_image(synthetic_image(width, height, seed=i), fmt)
+                })
+    return corpus
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def emit(report: Dict, output: str = None):
+    """Print the report as JSON, and also write it to output if given"""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
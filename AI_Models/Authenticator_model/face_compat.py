@@ -0,0 +1,63 @@
+"""
+Compatibility shim over face_recognition's private internals.
+
+face_recognition has no public call that encodes faces from several
+images at once, but dlib's face encoder does. Batched encoding needs
+face_recognition.api's private _raw_face_landmarks and face_encoder, so
+every use of them lives here: if a face_recognition release renames or
+drops them, batch_face_descriptors() returns None and callers fall back
+to the public per-image face_encodings().
+"""
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from face_recognition import api as _fr_api
+    _raw_face_landmarks = _fr_api._raw_face_landmarks
+    _face_encoder = _fr_api.face_encoder
+except (ImportError, AttributeError) as e:
+    logger.info(f"Batched face encoding unavailable: {str(e)}")
+    _raw_face_landmarks = None
+    _face_encoder = None
+
+
+def batch_encoding_available() -> bool:
+    """True if this face_recognition exposes the internals batching needs"""
+    return _raw_face_landmarks is not None and _face_encoder is not None
+
+
+def batch_face_descriptors(images_rgb: List[np.ndarray], locations: List[tuple],
+                           landmark_model: str = "large",
+                           num_jitters: int = 1) -> Optional[List[np.ndarray]]:
+    """
+    Encode one face per image with a single dlib descriptor call
+
+    Args:
+        images_rgb: RGB images, each containing the face to encode
+        locations: (top, right, bottom, left) box of the face in each image
+        landmark_model: "large" (68 points) or "small" (5 points)
+        num_jitters: Re-sampling passes per face, as in face_encodings()
+
+    Returns:
+        List[np.ndarray]: One 128-d encoding per image, or None if batched
+        encoding is unavailable (missing internals, or a dlib build
+        without the batch overload)
+    """
+    if not batch_encoding_available():
+        return None
+    try:
+        shapes = [
+            _raw_face_landmarks(img, [loc], model=landmark_model)
+            for img, loc in zip(images_rgb, locations)
+        ]
+        descriptors = _face_encoder.compute_face_descriptor(images_rgb, shapes, num_jitters)
+    except (TypeError, RuntimeError) as e:
+        # Older dlib builds have no batch overload
+        logger.debug(f"Batched encoding failed, encoding per image: {str(e)}")
+        return None
+    return [np.array(d[0]) for d in descriptors]
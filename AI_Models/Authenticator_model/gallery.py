@@ -0,0 +1,881 @@
+"""
+Server-side embedding gallery for the Face Authentication AI Service.
+
+Keeps every enrolled user's face embeddings in memory as a contiguous
+float32 matrix with precomputed norms, so a login only has to ship the
+probe embedding instead of the user's full set of stored templates.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# face_recognition (dlib) produces 128-d embeddings
+EMBEDDING_DIM = 128
+# Recent writes remembered for incremental index updates
+CHANGE_LOG_SIZE = 65536
+
+
+class UserTemplates:
+    """
+    Immutable snapshot of one user's enrolled embeddings
+
+    A consolidated snapshot stores the running centroid in row 0 and
+    diverse exemplars after it; observations counts every embedding
+    folded into it, including those no longer stored.
+    """
+
+    __slots__ = ("embeddings", "norms", "sq_norms", "observations", "consolidated")
+
+    def __init__(self, embeddings: np.ndarray, observations: Optional[int] = None,
+                 consolidated: bool = False):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+        self.norms = np.sqrt(self.sq_norms)
+        self.observations = len(self.embeddings) if observations is None else observations
+        self.consolidated = consolidated
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def exemplars(self) -> int:
+        """Stored embeddings, not counting a consolidated centroid row"""
+        return len(self) - 1 if self.consolidated else len(self)
+
+
+def as_embedding_matrix(embeddings, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Convert a list of embeddings to a validated float32 (n, dim) matrix
+
+    Args:
+        embeddings: Sequence of embeddings (or a single embedding)
+        dim: Expected embedding dimension
+
+    Returns:
+        np.ndarray: Contiguous float32 matrix
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2 or matrix.shape[1] != dim or matrix.shape[0] == 0:
+        raise ValueError(
+            f"Invalid embeddings shape: {matrix.shape}. Expected (n, {dim}).")
+    if not np.all(np.isfinite(matrix)):
+        raise ValueError("Embeddings contain NaN or infinite values")
+    return np.ascontiguousarray(matrix)
+
+
+def template_distances(templates: UserTemplates, probe: np.ndarray, metric: str = "euclidean") -> np.ndarray:
+    """
+    Distances from a probe embedding to every stored template
+
+    Uses the precomputed norms so each call is a single matrix-vector
+    product over the stored matrix.
+
+    Args:
+        templates: Enrolled templates of one user
+        probe: Probe embedding (float32, shape (dim,))
+        metric: Distance metric ('euclidean' or 'cosine')
+
+    Returns:
+        np.ndarray: Distance per stored template
+    """
+    dots = templates.embeddings @ probe
+    probe_sq_norm = float(np.dot(probe, probe))
+
+    if metric == "cosine":
+        probe_norm = np.sqrt(probe_sq_norm)
+        if probe_norm > 0 and np.all(templates.norms > 0):
+            return 1 - dots / (templates.norms * probe_norm)
+        return np.full(len(templates), 2.0, dtype=np.float32)
+
+    # ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b  (clamped against rounding)
+    sq = templates.sq_norms + probe_sq_norm - 2 * dots
+    return np.sqrt(np.maximum(sq, 0))
+
+
+def _min_pair_distance(matrix: np.ndarray) -> Tuple[float, int, int]:
+    """Smallest pairwise Euclidean distance among rows and the pair's indices"""
+    sq = np.einsum("ij,ij->i", matrix, matrix)
+    dist = sq[:, None] + sq[None, :] - 2 * matrix @ matrix.T
+    np.fill_diagonal(dist, np.inf)
+    i, j = np.unravel_index(int(np.argmin(dist)), dist.shape)
+    return float(np.sqrt(max(dist[i, j], 0))), int(i), int(j)
+
+
+def _add_exemplar(exemplars: np.ndarray, embedding: np.ndarray, max_exemplars: int) -> np.ndarray:
+    """
+    Offer an embedding to a bounded set of diverse exemplars
+
+    Below max_exemplars the embedding is simply added. Once full, it
+    replaces one member of the closest pair if that makes the set more
+    spread out (larger minimum pairwise distance); otherwise it is
+    redundant and dropped. Cost is O(max_exemplars^2), independent of
+    how many embeddings the user has accumulated.
+    """
+    if len(exemplars) < max_exemplars:
+        return np.vstack([exemplars, embedding])
+
+    current_min, i, j = _min_pair_distance(exemplars)
+    nearest = float(np.min(np.linalg.norm(exemplars - embedding, axis=1)))
+    if nearest <= current_min:
+        return exemplars
+
+    best, best_spread = exemplars, current_min
+    for drop in (i, j):
+        candidate = exemplars.copy()
+        candidate[drop] = embedding
+        spread = _min_pair_distance(candidate)[0]
+        if spread > best_spread:
+            best, best_spread = candidate, spread
+    return best
+
+
+def consolidate(current: Optional[UserTemplates], embeddings: np.ndarray,
+                max_exemplars: int) -> UserTemplates:
+    """
+    Fold new embeddings into a user's consolidated template
+
+    Args:
+        current: The user's stored templates (consolidated or raw), or None
+        embeddings: (n, dim) new embeddings
+        max_exemplars: Exemplars kept besides the centroid
+
+    Returns:
+        UserTemplates: Consolidated snapshot, [centroid, exemplars...]
+    """
+    dim = embeddings.shape[1]
+    centroid = np.zeros(dim, dtype=np.float64)
+    exemplars = np.empty((0, dim), dtype=np.float32)
+    count = 0
+
+    stream = embeddings
+    if current is not None and current.consolidated:
+        centroid = current.embeddings[0].astype(np.float64)
+        exemplars = current.embeddings[1:]
+        count = current.observations
+    elif current is not None:
+        # Raw history: replay it through the same incremental update once
+        stream = np.concatenate([current.embeddings, embeddings])
+
+    for embedding in stream:
+        count += 1
+        centroid += (embedding - centroid) / count
+        exemplars = _add_exemplar(exemplars, embedding, max_exemplars)
+
+    rows = np.vstack([centroid.astype(np.float32), exemplars])
+    return UserTemplates(rows, observations=count, consolidated=True)
+
+
+class EmbeddingGallery:
+    """
+    Thread-safe in-process store of enrolled embeddings keyed by user id
+
+    Writers build a new UserTemplates snapshot and swap it in under a lock,
+    so readers never observe a half-updated matrix.
+
+    With max_exemplars > 0 each user is kept as a consolidated template
+    (running centroid plus at most max_exemplars diverse exemplars), so
+    per-user match cost stays constant however many embeddings arrive.
+    """
+
+    # Rows live in this process only (see MappedEmbeddingGallery)
+    shared_rows = False
+
+    def __init__(self, dim: int = EMBEDDING_DIM, max_exemplars: int = 0):
+        self.dim = dim
+        self.max_exemplars = max_exemplars
+        self._users: Dict[str, UserTemplates] = {}
+        self._lock = threading.Lock()
+        # Bumped on every write so derived indexes know when to rebuild
+        self._version = 0
+        # (version, user_id) of recent writes, so indexes can update incrementally
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def enroll(self, user_id: str, embeddings, replace: bool = False) -> int:
+        """
+        Add embeddings for a user
+
+        Args:
+            user_id: User identifier
+            embeddings: One or more embeddings to store
+            replace: Drop the user's existing embeddings first
+
+        Returns:
+            int: Number of embeddings (exemplars) now stored for the user
+        """
+        matrix = as_embedding_matrix(embeddings, self.dim)
+        with self._lock:
+            current = None if replace else self._users.get(user_id)
+            if self.max_exemplars > 0:
+                templates = consolidate(current, matrix, self.max_exemplars)
+            else:
+                if current is not None:
+                    matrix = np.concatenate([current.embeddings, matrix])
+                templates = UserTemplates(matrix)
+            self._users[user_id] = templates
+            self._version += 1
+            self._changes.append((self._version, user_id))
+
+        logger.info(
+            f"Enrolled user {user_id}: {templates.exemplars} stored embeddings, "
+            f"{templates.observations} observed")
+        return templates.exemplars
+
+    def remove(self, user_id: str) -> bool:
+        """Remove a user's embeddings. Returns False if the user was unknown."""
+        with self._lock:
+            removed = self._users.pop(user_id, None) is not None
+            if removed:
+                self._version += 1
+                self._changes.append((self._version, user_id))
+            return removed
+
+    def changes_since(self, version: int):
+        """
+        Users written after a given version
+
+        Returns:
+            tuple: (current version, {user_id: UserTemplates, or None if
+            removed}), or None if the change log no longer reaches back
+            to version
+        """
+        with self._lock:
+            if version == self._version:
+                return version, {}
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed = []
+            for changed_version, user_id in reversed(self._changes):
+                if changed_version <= version:
+                    break
+                changed.append(user_id)
+            return self._version, {u: self._users.get(u) for u in changed}
+
+    def get(self, user_id: str) -> Optional[UserTemplates]:
+        """Get the current template snapshot for a user"""
+        return self._users.get(user_id)
+
+    def snapshot(self):
+        """Consistent (version, {user_id: UserTemplates}) view of the gallery"""
+        with self._lock:
+            return self.version, dict(self._users)
+
+    def packed(self) -> "PackedRows":
+        """All embeddings packed into one matrix for 1:N search"""
+        version, users = self.snapshot()
+        user_ids = list(users.keys())
+        if not user_ids:
+            return PackedRows.empty(version, self.dim)
+
+        counts = np.array([len(users[u]) for u in user_ids])
+        matrix = np.concatenate([users[u].embeddings for u in user_ids])
+        sq_norms = np.concatenate([users[u].sq_norms for u in user_ids])
+        row_users = np.repeat(np.arange(len(user_ids)), counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        def exact_rows(rows: np.ndarray) -> np.ndarray:
+            # Read back from the per-user snapshots so the index need not
+            # keep its own float32 copy
+            return np.stack([
+                users[user_ids[row_users[row]]].embeddings[row - starts[row_users[row]]]
+                for row in rows
+            ])
+
+        return PackedRows(version, matrix, sq_norms, row_users, user_ids,
+                          int(counts.max()), exact_rows)
+
+    def user_ids(self) -> List[str]:
+        return list(self._users.keys())
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def total_embeddings(self) -> int:
+        return sum(len(t) for t in list(self._users.values()))
+
+
+# ================== 1:N IDENTIFICATION ==================
+
+class PackedRows:
+    """
+    All gallery embeddings laid out as rows for 1:N search
+
+    row_users maps each row to an index in user_ids; rows mapped to -1
+    are dead (removed or replaced) and must never match. exact_rows reads
+    the float32 values of given rows back from the gallery.
+    """
+
+    __slots__ = ("version", "matrix", "sq_norms", "row_users", "user_ids",
+                 "max_rows_per_user", "_exact_rows")
+
+    def __init__(self, version: int, matrix: np.ndarray, sq_norms: np.ndarray,
+                 row_users: np.ndarray, user_ids: List[str], max_rows_per_user: int,
+                 exact_rows=None):
+        self.version = version
+        self.matrix = matrix
+        self.sq_norms = sq_norms
+        self.row_users = row_users
+        self.user_ids = user_ids
+        self.max_rows_per_user = max(1, max_rows_per_user)
+        self._exact_rows = exact_rows
+
+    @classmethod
+    def empty(cls, version: int, dim: int) -> "PackedRows":
+        return cls(version, np.empty((0, dim), dtype=np.float32),
+                   np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), [], 1)
+
+    def exact_rows(self, rows: np.ndarray) -> np.ndarray:
+        if self._exact_rows is not None:
+            return self._exact_rows(rows)
+        return np.asarray(self.matrix[rows], dtype=np.float32)
+
+
+def _kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Plain Lloyd's k-means used to train IVF coarse centroids
+
+    Args:
+        data: (n, dim) float32 training vectors
+        n_clusters: Number of centroids
+        n_iter: Lloyd iterations
+        seed: RNG seed so rebuilds are reproducible
+
+    Returns:
+        np.ndarray: (n_clusters, dim) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    data_sq = np.einsum("ij,ij->i", data, data)
+
+    for _ in range(n_iter):
+        cent_sq = np.einsum("ij,ij->i", centroids, centroids)
+        assign = np.argmin(
+            data_sq[:, None] + cent_sq[None, :] - 2 * data @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+
+def quantize(matrix: np.ndarray, quantization: str, scale: Optional[np.ndarray] = None):
+    """
+    Scalar-quantize float32 rows for scanning
+
+    Args:
+        matrix: (n, dim) float32 rows
+        quantization: 'float16' or 'int8' (symmetric, one scale per dimension)
+        scale: Existing int8 scale to encode with (None = fit one to matrix);
+            values beyond it saturate, and exact re-ranking absorbs the error
+
+    Returns:
+        tuple: (codes, scale) where codes * scale approximates matrix
+        (scale is None for float16)
+    """
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    if quantization == "int8":
+        if scale is None:
+            scale = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1])
+            scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+        return codes, scale
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def _row_distances(dots, sq_norms, norms, probe_sq: float, probe_norm: float, metric: str) -> np.ndarray:
+    """Distances from dot products and precomputed row norms"""
+    if metric == "cosine":
+        denom = norms * probe_norm
+        return np.where(denom > 0, 1 - dots / np.where(denom > 0, denom, 1), 2.0)
+    return np.sqrt(np.maximum(sq_norms + probe_sq - 2 * dots, 0))
+
+
+class _RowStore:
+    """
+    Rows of an in-process gallery as scanned by one index build
+
+    Updates only append past the end (growing by doubling) and never
+    rewrite a row a published state can see, so states share the buffers
+    without copying. Exact float32 rows are read back from the
+    UserTemplates each block of rows was stored from.
+    """
+
+    def __init__(self, dim: int, dtype, capacity: int = 1024):
+        self.codes = np.empty((max(1, capacity), dim), dtype=dtype)
+        self.sq_norms = np.empty(max(1, capacity), dtype=np.float32)
+        self.row_start = np.empty(max(1, capacity), dtype=np.int64)
+        self.rows = 0
+        # First row of each stored block -> the templates it came from
+        self.blocks: Dict[int, UserTemplates] = {}
+        # Only touched under the index lock
+        self.user_index: Dict[str, int] = {}
+        self.user_ids: List[str] = []
+        self.live: Dict[int, Tuple[int, int]] = {}
+
+    def append(self, codes: np.ndarray, templates: List[UserTemplates]) -> List[int]:
+        """Store the codes of several users' templates; returns each one's first row"""
+        start, end = self.rows, self.rows + len(codes)
+        if end > len(self.codes):
+            self._grow(end)
+        counts = np.array([len(t) for t in templates], dtype=np.int64)
+        starts = start + np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        self.codes[start:end] = codes
+        self.sq_norms[start:end] = np.concatenate([t.sq_norms for t in templates])
+        self.row_start[start:end] = np.repeat(starts, counts)
+        self.blocks.update(zip(starts.tolist(), templates))
+        self.rows = end
+        return starts.tolist()
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * len(self.codes))
+        for name in ("codes", "sq_norms", "row_start"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.rows] = old[:self.rows]
+            setattr(self, name, new)
+
+    def exact_rows(self, rows: np.ndarray) -> np.ndarray:
+        starts = self.row_start[rows]
+        return np.stack([
+            self.blocks[start].embeddings[row - start] for row, start in zip(rows.tolist(), starts.tolist())
+        ])
+
+
+class _IndexState:
+    """Immutable view of the index used by one search"""
+
+    __slots__ = ("version", "codes", "scale", "sq_norms", "norms", "row_users",
+                 "user_ids", "max_rows_per_user", "centroids", "lists",
+                 "trained_rows", "dead_rows", "store")
+
+    def __init__(self, version: int, codes, sq_norms: np.ndarray, row_users: np.ndarray,
+                 user_ids: List[str], max_rows_per_user: int, scale=None,
+                 centroids=None, lists=None, trained_rows: int = 0,
+                 store: Optional[_RowStore] = None):
+        self.version = version
+        # Rows as scanned: float32 (possibly the shared map itself), or
+        # quantized codes (dequantize with scale)
+        self.codes = codes
+        self.scale = scale
+        self.sq_norms = sq_norms
+        self.norms = np.sqrt(sq_norms)
+        self.row_users = row_users
+        self.user_ids = user_ids
+        self.max_rows_per_user = max(1, max_rows_per_user)
+        self.centroids = centroids
+        # IVF inverted lists: row ids of each list (None = flat scan)
+        self.lists = lists
+        # Live rows when the IVF centroids were trained
+        self.trained_rows = trained_rows
+        self.dead_rows = int(np.count_nonzero(row_users < 0))
+        # Row buffers of an in-process gallery (None = the gallery's shared map)
+        self.store = store
+
+    @property
+    def live_rows(self) -> int:
+        return len(self.codes) - self.dead_rows
+
+    def exact_rows(self, rows: np.ndarray) -> np.ndarray:
+        if self.store is not None:
+            return self.store.exact_rows(rows)
+        return np.asarray(self.codes[rows], dtype=np.float32)
+
+
+class IdentificationIndex:
+    """
+    1:N search index over every embedding in an EmbeddingGallery
+
+    All embeddings are laid out as rows (row -> user) and scanned with
+    blocked matrix products so temporary memory stays bounded by
+    block_size. Once the gallery is large enough, an IVF-style coarse
+    quantizer restricts each search to the nprobe closest clusters; the
+    lists hold row ids, so rows are never copied into list order.
+
+    Gallery writes are applied incrementally: new rows are appended and
+    added to their nearest existing list, and replaced or removed rows
+    are marked dead. The expensive work (k-means retraining once the
+    gallery has grown by retrain_growth, or dropping accumulated dead
+    rows) runs on a background thread while searches keep using the
+    current state. Only the first search builds the index inline.
+
+    With quantization set to 'float16' or 'int8' the index keeps only
+    the quantized rows (2x / 4x smaller than float32). The scan ranks
+    rows on the quantized values and the best rerank_factor x candidates
+    are re-scored against exact float32 values read back from the
+    gallery, so returned distances are exact. Quantization saves memory,
+    not time: blocks are widened to float32 for the BLAS product, so a
+    quantized scan is slower than a float32 one (int8 only slightly,
+    float16 several times over, as numpy's float16 conversion is slow).
+    A memory-mapped gallery is never quantized: its rows are already
+    shared between processes, so per-process codes would add memory
+    instead of saving it.
+    """
+
+    def __init__(self, gallery: EmbeddingGallery, block_size: int = 16384,
+                 ivf_lists: int = 0, ivf_nprobe: int = 8, ivf_min_size: int = 20000,
+                 quantization: str = "none", rerank_factor: int = 4,
+                 retrain_growth: float = 2.0):
+        self.gallery = gallery
+        self.block_size = max(1, block_size)
+        # ivf_lists: 0 = auto (~sqrt(n)), < 0 = IVF disabled
+        self.ivf_lists = ivf_lists
+        self.ivf_nprobe = max(1, ivf_nprobe)
+        self.ivf_min_size = ivf_min_size
+        self.retrain_growth = max(1.0, retrain_growth)
+        if quantization not in ("none", "float16", "int8"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        if quantization != "none" and gallery.shared_rows:
+            logger.warning(
+                f"{quantization} quantization disabled: the gallery's rows are "
+                f"memory-mapped and shared, scanning them directly")
+            quantization = "none"
+        self.quantization = quantization
+        self.rerank_factor = max(1, rerank_factor)
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._trained_centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._state: Optional[_IndexState] = None
+
+    def _current_state(self) -> _IndexState:
+        state = self._state
+        if state is not None and state.version == self.gallery.version:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None:
+                state = self._build_state()
+            elif state.version != self.gallery.version:
+                state = self._update_state(state) or self._build_state()
+            self._state = state
+        self._maybe_rebuild(state)
+        return state
+
+    # ---------- full builds ----------
+
+    def _build_state(self) -> _IndexState:
+        if self.gallery.shared_rows:
+            packed = self.gallery.packed()
+            live = np.flatnonzero(packed.row_users >= 0)
+            centroids, lists = self._build_ivf(packed.matrix, live)
+            state = _IndexState(
+                packed.version, packed.matrix, packed.sq_norms, packed.row_users,
+                packed.user_ids, packed.max_rows_per_user,
+                centroids=centroids, lists=lists, trained_rows=self._trained_size)
+        else:
+            version, users = self.gallery.snapshot()
+            user_ids = list(users)
+            templates = [users[u] for u in user_ids]
+            matrix = (np.concatenate([t.embeddings for t in templates]) if templates
+                      else np.empty((0, self.gallery.dim), dtype=np.float32))
+
+            scale = None
+            codes = matrix
+            if self.quantization != "none" and len(matrix):
+                codes, scale = quantize(matrix, self.quantization)
+            store = _RowStore(self.gallery.dim, codes.dtype, capacity=2 * len(matrix))
+            starts = store.append(codes, templates) if templates else []
+            store.user_ids = user_ids
+            store.user_index = {u: i for i, u in enumerate(user_ids)}
+            store.live = {i: (start, len(t)) for i, (start, t) in enumerate(zip(starts, templates))}
+            counts = np.array([len(t) for t in templates], dtype=np.int64)
+
+            centroids, lists = self._build_ivf(matrix, np.arange(len(matrix)))
+            state = _IndexState(
+                version, store.codes[:store.rows], store.sq_norms[:store.rows],
+                np.repeat(np.arange(len(user_ids)), counts), store.user_ids,
+                int(counts.max()) if len(counts) else 1, scale=scale,
+                centroids=centroids, lists=lists, trained_rows=self._trained_size, store=store)
+
+        logger.info(
+            f"Rebuilt identification index: {state.live_rows} rows, "
+            f"{len(state.user_ids)} users, IVF lists: "
+            f"{0 if state.centroids is None else len(state.centroids)}, "
+            f"quantization: {self.quantization} ({state.codes.nbytes / 2 ** 20:.1f} MB"
+            f"{', shared' if state.store is None else ''})")
+        return state
+
+    def _build_ivf(self, matrix, rows: np.ndarray):
+        """Assign the given rows to IVF lists. Returns (centroids, lists of row ids)."""
+        n = len(rows)
+        if self.ivf_lists < 0 or n < self.ivf_min_size:
+            return None, None
+
+        # Retrain only when the gallery has grown by retrain_growth since
+        # the last training (or the configured list count changed)
+        centroids = self._trained_centroids
+        if (centroids is None or n >= self.retrain_growth * self._trained_size
+                or (self.ivf_lists and len(centroids) != self.ivf_lists)):
+            n_lists = max(1, min(self.ivf_lists or int(np.sqrt(n)), n))
+            rng = np.random.default_rng(0)
+            sample_size = min(n, 256 * n_lists)
+            sample = np.asarray(matrix[np.sort(rng.choice(rows, sample_size, replace=False))],
+                                dtype=np.float32)
+            centroids = _kmeans(sample, n_lists)
+            self._trained_centroids = centroids
+            self._trained_size = n
+
+        lists = self._add_to_lists([np.empty(0, dtype=np.int64)] * len(centroids),
+                                   centroids, matrix, rows)
+        return centroids, lists
+
+    def _add_to_lists(self, lists: List[np.ndarray], centroids: np.ndarray,
+                      matrix, rows: np.ndarray, vectors: Optional[np.ndarray] = None):
+        """
+        New lists with rows appended to their nearest centroid's list
+
+        vectors holds the float32 values of rows when matrix is quantized.
+        """
+        if len(rows) == 0:
+            return lists
+        assign = np.empty(len(rows), dtype=np.int64)
+        cent_sq = np.einsum("ij,ij->i", centroids, centroids)
+        for start in range(0, len(rows), self.block_size):
+            end = min(start + self.block_size, len(rows))
+            block = vectors[start:end] if vectors is not None else matrix[rows[start:end]]
+            assign[start:end] = np.argmin(
+                cent_sq[None, :] - 2 * np.asarray(block, dtype=np.float32) @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+        lists = list(lists)
+        for i in np.flatnonzero(np.diff(offsets)):
+            lists[i] = np.concatenate([lists[i], rows[order[offsets[i]:offsets[i + 1]]]])
+        return lists
+
+    # ---------- incremental updates ----------
+
+    def _update_state(self, state: _IndexState) -> Optional[_IndexState]:
+        """
+        Apply gallery writes made since state was built
+
+        Returns None when they cannot be applied incrementally (the
+        gallery's change log no longer reaches back to state.version).
+        """
+        if state.store is None:
+            return self._update_shared(state)
+
+        changes = self.gallery.changes_since(state.version)
+        if changes is None:
+            return None
+        version, users = changes
+        store = state.store
+
+        dead: List[Tuple[int, int]] = []
+        added_users, added = [], []
+        for user_id, templates in users.items():
+            index = store.user_index.get(user_id)
+            if index is not None and index in store.live:
+                dead.append(store.live.pop(index))
+            if templates is None:
+                continue
+            if index is None:
+                index = len(store.user_ids)
+                store.user_index[user_id] = index
+                store.user_ids.append(user_id)
+            added_users.append(index)
+            added.append(templates)
+
+        old_rows = store.rows
+        max_rows = state.max_rows_per_user
+        vectors = None
+        if added:
+            vectors = np.concatenate([t.embeddings for t in added])
+            codes = vectors
+            if self.quantization != "none":
+                codes, _ = quantize(vectors, self.quantization, state.scale)
+            starts = store.append(codes, added)
+            for index, start, templates in zip(added_users, starts, added):
+                store.live[index] = (start, len(templates))
+            max_rows = max(max_rows, max(len(t) for t in added))
+
+        # Copy: a running search may hold the previous row_users
+        row_users = np.empty(store.rows, dtype=np.int64)
+        row_users[:len(state.row_users)] = state.row_users
+        for start, count in dead:
+            row_users[start:start + count] = -1
+        for index, templates in zip(added_users, added):
+            start, count = store.live[index]
+            row_users[start:start + count] = index
+
+        lists = state.lists
+        if lists is not None:
+            lists = self._add_to_lists(lists, state.centroids, store.codes,
+                                       np.arange(old_rows, store.rows), vectors)
+        return _IndexState(
+            version, store.codes[:store.rows], store.sq_norms[:store.rows], row_users,
+            store.user_ids, max_rows, scale=state.scale, centroids=state.centroids,
+            lists=lists, trained_rows=state.trained_rows, store=store)
+
+    def _update_shared(self, state: _IndexState) -> _IndexState:
+        """Pick up rows appended to (or rewritten in) a shared, mapped gallery"""
+        packed = self.gallery.packed()
+        lists = state.lists
+        if lists is not None:
+            old_rows = len(state.row_users)
+            # Rows reused in place (consolidated slots) come back to life
+            revived = np.flatnonzero((state.row_users < 0) & (packed.row_users[:old_rows] >= 0))
+            appended = old_rows + np.flatnonzero(packed.row_users[old_rows:] >= 0)
+            lists = self._add_to_lists(lists, state.centroids, packed.matrix,
+                                       np.concatenate([revived, appended]))
+        return _IndexState(
+            packed.version, packed.matrix, packed.sq_norms, packed.row_users,
+            packed.user_ids, packed.max_rows_per_user, centroids=state.centroids,
+            lists=lists, trained_rows=state.trained_rows)
+
+    def _maybe_rebuild(self, state: _IndexState):
+        """Start a background rebuild when IVF needs (re)training or dead rows pile up"""
+        live = state.live_rows
+        retrain = self.ivf_lists >= 0 and live >= self.ivf_min_size and (
+            state.centroids is None or live >= self.retrain_growth * state.trained_rows)
+        compact = state.store is not None and state.dead_rows > max(live, self.block_size)
+        if not (retrain or compact):
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="identify-rebuild", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            state = self._build_state()
+            with self._lock:
+                if state.version != self.gallery.version:
+                    # Catch up with writes made during the build
+                    state = self._update_state(state) or self._build_state()
+                self._state = state
+        except Exception as e:
+            logger.error(f"Background identification index rebuild failed: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+    def __len__(self) -> int:
+        """Live rows in the current index state (does not trigger a build)"""
+        state = self._state
+        return 0 if state is None else state.live_rows
+
+    # ---------- search ----------
+
+    def _candidate_blocks(self, state: _IndexState, probe: np.ndarray):
+        """
+        Blocks of rows to scan for a probe
+
+        Yields (rows, block): rows is a slice of all rows for a flat scan,
+        or the row ids of the nprobe closest IVF lists.
+        """
+        if state.lists is None:
+            for start in range(0, len(state.codes), self.block_size):
+                rows = slice(start, min(start + self.block_size, len(state.codes)))
+                yield rows, state.codes[rows]
+            return
+
+        centroids = state.centroids
+        cent_dist = np.einsum("ij,ij->i", centroids, centroids) - 2 * centroids @ probe
+        nprobe = min(self.ivf_nprobe, len(centroids))
+        probed = np.argpartition(cent_dist, nprobe - 1)[:nprobe]
+        # Sorted, unique ids: reads from a mapped file stay sequential, and a
+        # reused row listed under its old and new cluster is scanned once
+        candidates = np.unique(np.concatenate([state.lists[i] for i in probed]))
+        for start in range(0, len(candidates), self.block_size):
+            rows = candidates[start:start + self.block_size]
+            yield rows, state.codes[rows]
+
+    def search(self, probe: np.ndarray, k: int = 5, metric: str = "euclidean"):
+        """
+        Find the k closest enrolled users to a probe embedding
+
+        Args:
+            probe: Probe embedding (float32, shape (dim,))
+            k: Number of distinct users to return
+            metric: Distance metric ('euclidean' or 'cosine')
+
+        Returns:
+            List[Tuple[str, float]]: (user_id, distance) pairs, closest first
+        """
+        state = self._current_state()
+        if state.live_rows == 0 or k <= 0:
+            return []
+
+        quantized = state.codes.dtype != np.float32
+        # Any of the k closest users has its best row within the top
+        # k * max_rows_per_user rows, so that many rows per block suffice
+        take_rows = k * state.max_rows_per_user
+        if quantized:
+            take_rows *= self.rerank_factor
+        probe_sq = float(np.dot(probe, probe))
+        probe_norm = np.sqrt(probe_sq)
+        # int8 codes are dequantized by folding the scale into the probe
+        scan_probe = probe * state.scale if state.scale is not None else probe
+        block_buffer = np.empty((self.block_size, len(probe)), dtype=np.float32) if quantized else None
+
+        cand_rows, cand_dist = [], []
+        for rows, block in self._candidate_blocks(state, probe):
+            if quantized:
+                # Widen into a cache-sized float32 buffer so the product runs in BLAS
+                widened = block_buffer[:len(block)]
+                np.copyto(widened, block, casting="unsafe")
+                block = widened
+            dist = _row_distances(
+                block @ scan_probe, state.sq_norms[rows], state.norms[rows],
+                probe_sq, probe_norm, metric)
+
+            # Dead rows (removed or replaced embeddings) never match
+            dist[state.row_users[rows] < 0] = np.inf
+
+            if take_rows < len(dist):
+                top = np.argpartition(dist, take_rows - 1)[:take_rows]
+            else:
+                top = np.arange(len(dist))
+            row_ids = np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows
+            cand_rows.append(row_ids[top])
+            cand_dist.append(dist[top])
+
+        if not cand_rows:
+            return []
+        rows = np.concatenate(cand_rows)
+        dist = np.concatenate(cand_dist)
+
+        if quantized:
+            # Re-score the best candidates on exact float32 values
+            if take_rows < len(dist):
+                keep = np.argpartition(dist, take_rows - 1)[:take_rows]
+                rows, dist = rows[keep], dist[keep]
+            rows = rows[np.isfinite(dist)]
+            exact = state.exact_rows(rows) if len(rows) else np.empty((0, len(probe)))
+            dist = _row_distances(
+                exact @ probe, state.sq_norms[rows], state.norms[rows],
+                probe_sq, probe_norm, metric)
+
+        results = []
+        seen = set()
+        for i in np.argsort(dist, kind="stable"):
+            user = int(state.row_users[rows[i]])
+            if user < 0 or user in seen or not np.isfinite(dist[i]):
+                continue
+            seen.add(user)
+            results.append((state.user_ids[user], float(dist[i])))
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,370 @@
+"""
+Memory-mapped embedding gallery shared by all uvicorn worker processes.
+
+Embeddings live in one append-only float32 file that every worker maps
+read-only, so the pages are shared through the OS page cache instead of
+being copied into each worker. A JSON-lines log next to it records which
+rows belong to which user; workers tail the log to pick up enrollments
+made by other workers without reloading anything.
+
+Layout of the gallery directory:
+    embeddings.f32  little-endian float32 rows, dim values each
+    index.log       one JSON record per line:
+                    {"op": "add", "user": ..., "start": row, "count": n, "replace": bool}
+                    consolidated users' records also carry
+                    "observations": n, "slots": [row, row], "capacity": rows
+                    {"op": "remove", "user": ...}
+    .lock           flock()ed by writers
+
+A consolidated user (max_exemplars > 0) owns two fixed slots of
+max_exemplars + 1 rows. Each update overwrites the slot that is not
+live and then logs it as the live one, so repeated updates (e.g. every
+verified login) never grow the file. Readers still on the old slot are
+not disturbed until the update after next.
+
+Removed rows, and rows replaced by append-mode enrollment, stay in the
+file (marked dead in memory) until compact() copies the live users into
+a fresh directory.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from gallery import (EMBEDDING_DIM, EmbeddingGallery, PackedRows, UserTemplates,
+                     as_embedding_matrix, consolidate)
+
+logger = logging.getLogger(__name__)
+
+_DISK_DTYPE = np.dtype("<f4")
+
+
+class MappedEmbeddingGallery(EmbeddingGallery):
+    """EmbeddingGallery backed by a memory-mapped, append-only store"""
+
+    # packed() is the shared map itself; indexes diff it instead of
+    # reading changes_since()
+    shared_rows = True
+
+    def __init__(self, directory: str, dim: int = EMBEDDING_DIM, max_exemplars: int = 0):
+        super().__init__(dim, max_exemplars)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._data_path = os.path.join(directory, "embeddings.f32")
+        self._log_path = os.path.join(directory, "index.log")
+        self._lock_path = os.path.join(directory, ".lock")
+        self._row_bytes = dim * _DISK_DTYPE.itemsize
+
+        # State rebuilt from the log
+        self._log_offset = 0
+        self._records = 0
+        self._rows = 0
+        self._map = np.empty((0, dim), dtype=np.float32)
+        self._row_sq_norms = np.empty(0, dtype=np.float32)
+        self._row_users = np.empty(0, dtype=np.int64)
+        self._user_list: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self._ranges: Dict[str, List[Tuple[int, int]]] = {}
+        # Observation count of users stored as a consolidated template
+        self._observations: Dict[str, int] = {}
+        # Consolidated users' fixed slots: ((start_a, start_b), capacity)
+        self._slots: Dict[str, Tuple[Tuple[int, int], int]] = {}
+        self._refresh_lock = threading.RLock()
+
+        self.refresh()
+        logger.info(
+            f"Opened mapped gallery at {directory}: {len(self._ranges)} users, "
+            f"{self._rows} rows")
+
+    # ---------- reading ----------
+
+    @property
+    def version(self) -> int:
+        self.refresh()
+        return self._records
+
+    def refresh(self) -> bool:
+        """
+        Apply log records written since the last refresh (by any process)
+
+        Returns:
+            bool: True if anything changed
+        """
+        try:
+            size = os.path.getsize(self._log_path)
+        except FileNotFoundError:
+            return False
+        if size <= self._log_offset:
+            return False
+
+        with self._refresh_lock:
+            with open(self._log_path, "rb") as f:
+                f.seek(self._log_offset)
+                chunk = f.read(size - self._log_offset)
+            # Only apply complete lines; a writer may be mid-append
+            end = chunk.rfind(b"\n")
+            if end < 0:
+                return False
+
+            row_updates: List[Tuple[int, int, int]] = []
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line), row_updates)
+            self._log_offset += end + 1
+            self._remap(row_updates)
+            return True
+
+    def _apply(self, record: dict, row_updates: List[Tuple[int, int, int]]):
+        user_id = record["user"]
+        self._records += 1
+        self._users.pop(user_id, None)
+
+        if record["op"] == "remove" or record.get("replace"):
+            for start, count in self._ranges.pop(user_id, []):
+                row_updates.append((start, count, -1))
+            self._observations.pop(user_id, None)
+        if record["op"] != "add":
+            self._slots.pop(user_id, None)
+            return
+        if "observations" in record:
+            self._observations[user_id] = int(record["observations"])
+        if "slots" in record:
+            slots, capacity = tuple(int(s) for s in record["slots"]), int(record["capacity"])
+            self._slots[user_id] = (slots, capacity)
+            self._rows = max(self._rows, max(slots) + capacity)
+        elif record.get("replace"):
+            self._slots.pop(user_id, None)
+
+        if user_id not in self._user_index:
+            self._user_index[user_id] = len(self._user_list)
+            self._user_list.append(user_id)
+        start, count = int(record["start"]), int(record["count"])
+        self._ranges.setdefault(user_id, []).append((start, count))
+        row_updates.append((start, count, self._user_index[user_id]))
+        self._rows = max(self._rows, start + count)
+
+    def _remap(self, row_updates: List[Tuple[int, int, int]]):
+        old_rows = len(self._map)
+        if self._rows > old_rows:
+            self._map = np.memmap(
+                self._data_path, dtype=_DISK_DTYPE, mode="r", shape=(self._rows, self.dim))
+            added = np.asarray(self._map[old_rows:])
+            self._row_sq_norms = np.concatenate(
+                [self._row_sq_norms, np.einsum("ij,ij->i", added, added)])
+            self._row_users = np.concatenate(
+                [self._row_users, np.full(self._rows - old_rows, -1, dtype=np.int64)])
+            # Cached templates are views that would pin the old mapping (and
+            # its file descriptor); rebuild them from the new one on demand
+            self._users.clear()
+        else:
+            # Never mutate an array a running search may hold
+            self._row_users = self._row_users.copy()
+
+        rewritten = [(start, count) for start, count, user in row_updates
+                     if user >= 0 and start < old_rows]
+        if rewritten:
+            # Slots overwritten in place need their norms recomputed
+            self._row_sq_norms = self._row_sq_norms.copy()
+            for start, count in rewritten:
+                rows = np.asarray(self._map[start:start + count])
+                self._row_sq_norms[start:start + count] = np.einsum("ij,ij->i", rows, rows)
+
+        for start, count, user in row_updates:
+            self._row_users[start:start + count] = user
+
+    def get(self, user_id: str) -> Optional[UserTemplates]:
+        """Templates for a user; views into the shared map when contiguous"""
+        self.refresh()
+        with self._refresh_lock:
+            templates = self._users.get(user_id)
+            if templates is not None:
+                return templates
+            ranges = self._ranges.get(user_id)
+            if not ranges:
+                return None
+            if len(ranges) == 1:
+                start, count = ranges[0]
+                matrix = np.asarray(self._map[start:start + count])
+            else:
+                matrix = np.concatenate(
+                    [np.asarray(self._map[start:start + count]) for start, count in ranges])
+            observations = self._observations.get(user_id)
+            templates = UserTemplates(matrix, observations, consolidated=observations is not None)
+            self._users[user_id] = templates
+            return templates
+
+    def snapshot(self):
+        self.refresh()
+        with self._refresh_lock:
+            users = list(self._ranges.keys())
+            return self._records, {u: self.get(u) for u in users}
+
+    def packed(self) -> PackedRows:
+        """Packed rows are the shared map itself; removed rows are marked dead"""
+        self.refresh()
+        with self._refresh_lock:
+            max_rows_per_user = max(
+                (sum(c for _, c in r) for r in self._ranges.values()), default=1)
+            return PackedRows(self._records, self._map, self._row_sq_norms,
+                              self._row_users, list(self._user_list), max_rows_per_user)
+
+    def user_ids(self) -> List[str]:
+        self.refresh()
+        return list(self._ranges.keys())
+
+    def __contains__(self, user_id: str) -> bool:
+        self.refresh()
+        return user_id in self._ranges
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._ranges)
+
+    def total_embeddings(self) -> int:
+        self.refresh()
+        return sum(c for r in list(self._ranges.values()) for _, c in r)
+
+    # ---------- writing ----------
+
+    @contextmanager
+    def _writer_lock(self):
+        with self._lock:
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # Catch up with other writers before deciding row offsets
+                    self.refresh()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append_record(self, record: dict):
+        with open(self._log_path, "ab") as f:
+            f.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_rows(self, matrix: np.ndarray, start: Optional[int] = None,
+                    reserve: int = 0) -> int:
+        """
+        Write rows at start, or append them (plus reserve zero rows) at the end
+
+        Returns:
+            int: First row written
+        """
+        data = np.ascontiguousarray(matrix, dtype=_DISK_DTYPE).tobytes()
+        fd = os.open(self._data_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if start is None:
+                start = self._rows
+                # Drop any tail left by a writer that died before logging it
+                os.ftruncate(fd, (start + len(matrix) + reserve) * self._row_bytes)
+            os.pwrite(fd, data, start * self._row_bytes)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return start
+
+    def _enroll_consolidated(self, user_id: str, matrix: np.ndarray, replace: bool) -> UserTemplates:
+        """Write a consolidated template into the user's non-live slot (writer lock held)"""
+        templates = consolidate(
+            None if replace else self.get(user_id), matrix, self.max_exemplars)
+        capacity = self.max_exemplars + 1
+        record = {"op": "add", "user": user_id, "replace": True,
+                  "count": len(templates), "observations": templates.observations,
+                  "capacity": capacity}
+
+        slots = self._slots.get(user_id)
+        live = self._ranges.get(user_id, [])
+        if slots is not None and slots[1] == capacity and len(live) == 1:
+            # Overwrite whichever slot readers are not using
+            a, b = slots[0]
+            start = b if live[0][0] == a else a
+            self._write_rows(templates.embeddings, start)
+        else:
+            # First consolidated write (or capacity changed): claim two slots
+            a = self._write_rows(templates.embeddings, reserve=2 * capacity - len(templates))
+            start, b = a, a + capacity
+        record.update(start=start, slots=[a, b])
+        self._append_record(record)
+        return templates
+
+    def enroll(self, user_id: str, embeddings, replace: bool = False) -> int:
+        """Store embeddings for a user in the shared store"""
+        matrix = as_embedding_matrix(embeddings, self.dim)
+        with self._writer_lock():
+            if self.max_exemplars > 0:
+                self._enroll_consolidated(user_id, matrix, replace)
+            else:
+                start = self._write_rows(matrix)
+                self._append_record({
+                    "op": "add", "user": user_id, "start": start,
+                    "count": len(matrix), "replace": replace
+                })
+            self.refresh()
+            templates = self.get(user_id)
+
+        logger.info(
+            f"Enrolled user {user_id}: {templates.exemplars} stored embeddings, "
+            f"{templates.observations} observed")
+        return templates.exemplars
+
+    def remove(self, user_id: str) -> bool:
+        with self._writer_lock():
+            if user_id not in self._ranges:
+                return False
+            self._append_record({"op": "remove", "user": user_id})
+            self.refresh()
+            return True
+
+    def dead_rows(self) -> int:
+        """Rows in the file that belong to no user (removed, replaced or spare slots)"""
+        self.refresh()
+        return int(np.count_nonzero(self._row_users < 0))
+
+    def compact(self, directory: str) -> "MappedEmbeddingGallery":
+        """
+        Copy the live users into a fresh store, dropping dead rows
+
+        Run it offline (or against a quiesced gallery) and point
+        GALLERY_DIR at the new directory.
+
+        Args:
+            directory: Empty or missing directory for the new store
+
+        Returns:
+            MappedEmbeddingGallery: The compacted store
+        """
+        if os.path.exists(os.path.join(directory, "index.log")):
+            raise ValueError(f"{directory} already holds a gallery")
+        target = MappedEmbeddingGallery(directory, self.dim, self.max_exemplars)
+        with target._writer_lock():
+            for user_id in self.user_ids():
+                templates = self.get(user_id)
+                if templates.consolidated and target.max_exemplars > 0:
+                    # Carry the centroid and observation count over unchanged
+                    capacity = max(target.max_exemplars + 1, len(templates))
+                    start = target._write_rows(
+                        templates.embeddings, reserve=2 * capacity - len(templates))
+                    target._append_record({
+                        "op": "add", "user": user_id, "replace": True, "start": start,
+                        "count": len(templates), "observations": templates.observations,
+                        "slots": [start, start + capacity], "capacity": capacity
+                    })
+                else:
+                    start = target._write_rows(templates.embeddings)
+                    target._append_record({
+                        "op": "add", "user": user_id, "start": start,
+                        "count": len(templates), "replace": True
+                    })
+                target.refresh()
+        logger.info(
+            f"Compacted gallery into {directory}: {len(target)} users, "
+            f"{target._rows} rows (was {self._rows})")
+        return target
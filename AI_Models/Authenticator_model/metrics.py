@@ -0,0 +1,192 @@
+"""
+Latency histograms and counters exposed in the Prometheus text format.
+
+Pipeline stages (read, decode, color, resize, detect, encode, match, ...) are
+timed with stage(); the API layer adds per-endpoint request latency and
+status counters. Observations made inside encode pool workers are
+collected per job and merged into the API process (see run_collected),
+so /metrics covers every worker without a shared-memory registry.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds in seconds; dlib detection sits in the 50ms-1s range
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms and counters"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # name -> labels -> [bucket counts..., +Inf count, sum]
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels):
+        """Add one observation (seconds) to a histogram"""
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            cells = series.get(key)
+            if cells is None:
+                cells = series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    cells[i] += 1
+                    break
+            else:
+                cells[len(self.buckets)] += 1
+            cells[-1] += value
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        """Increment a counter"""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def drain(self) -> Dict[str, Any]:
+        """Take and reset everything recorded so far"""
+        with self._lock:
+            data = {"histograms": self._histograms, "counters": self._counters}
+            self._histograms, self._counters = {}, {}
+        return data
+
+    def merge(self, data: Dict[str, Any]):
+        """Add the output of another registry's drain()"""
+        with self._lock:
+            for name, series in data.get("histograms", {}).items():
+                target = self._histograms.setdefault(name, {})
+                for key, cells in series.items():
+                    current = target.setdefault(key, [0.0] * len(cells))
+                    for i, v in enumerate(cells):
+                        current[i] += v
+            for name, series in data.get("counters", {}).items():
+                target = self._counters.setdefault(name, {})
+                for key, value in series.items():
+                    target[key] = target.get(key, 0.0) + value
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, cells in sorted(self._histograms[name].items()):
+                    cumulative = 0.0
+                    for bound, count in zip(self.buckets, cells):
+                        cumulative += count
+                        lines.append(
+                            f"{name}_bucket{_format_labels(key, [('le', repr(bound))])} "
+                            f"{_format_value(cumulative)}")
+                    total = cumulative + cells[len(self.buckets)]
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {_format_value(total)}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {cells[-1]!r}")
+                    lines.append(f"{name}_count{_format_labels(key)} {_format_value(total)}")
+            for name in sorted(self._counters):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_family(name: str, help_text: str, kind: str,
+                   values: Iterable[Tuple[Dict[str, Any], float]]) -> str:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in values:
+        lines.append(f"{name}{_format_labels(_labels(labels))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render_gauges(name: str, help_text: str, values: Iterable[Tuple[Dict[str, Any], float]]) -> str:
+    """Prometheus text for a gauge family computed at scrape time"""
+    return _render_family(name, help_text, "gauge", values)
+
+
+def render_counters(name: str, help_text: str, values: Iterable[Tuple[Dict[str, Any], float]]) -> str:
+    """Prometheus text for a counter family read from running totals at scrape time"""
+    return _render_family(name, help_text, "counter", values)
+
+
+def render_stats(prefix: str, help_text: str, stats: Dict[str, Any],
+                 gauges: Iterable[str], totals: Iterable[str]) -> str:
+    """
+    Prometheus text for a component's stats() snapshot
+
+    Current state (gauges) goes in one family labelled by field. Running
+    totals each get a <prefix>_<field>_total counter, so rate() and
+    increase() handle restarts correctly.
+    """
+    parts = [render_gauges(prefix, f"{help_text} state", [({"field": k}, stats[k]) for k in gauges])]
+    for k in totals:
+        parts.append(render_counters(
+            f"{prefix}_{k}_total", f"{help_text}: {k.replace('_', ' ')}", [({}, stats[k])]))
+    return "".join(parts)
+
+
+STAGE_METRIC = "face_auth_stage_seconds"
+
+registry = MetricsRegistry()
+registry.describe(STAGE_METRIC, "Time spent in each pipeline stage")
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage"""
+    return registry.timer(STAGE_METRIC, stage=name)
+
+
+def run_collected(fn: Callable, *args) -> Tuple[bool, Any, Dict[str, Any]]:
+    """
+    Run fn in a pool worker and hand back what it recorded
+
+    Workers run one job at a time, so everything in the worker's registry
+    after the job belongs to it; whatever a forked worker inherited from
+    the parent is dropped first so nothing is counted twice.
+
+    Returns:
+        tuple: (ok, result or exception, drained metrics)
+    """
+    registry.drain()
+    try:
+        result = fn(*args)
+        ok = True
+    except Exception as e:
+        result, ok = e, False
+    return ok, result, registry.drain()
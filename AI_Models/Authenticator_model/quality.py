@@ -0,0 +1,176 @@
+"""
+Cheap image-quality gate run before the face encoder.
+
+Blurry, badly exposed or tiny-face uploads rarely produce a usable
+embedding, yet each one costs a 128-d encoding before failing to match.
+Once the face box is known (detected, hinted by the client, or the whole
+pre-cropped image) the gate checks its size, then measures exposure
+(grayscale histogram) and sharpness (variance of the Laplacian) inside
+the box, and rejects the frame with a reason the client can act on
+("move closer", "more light", ...). Measuring the box rather than the
+frame keeps a bright window or a dark, featureless wall behind the user
+from deciding the outcome.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+REASONS = ("blurry", "too_dark", "too_bright", "face_too_small")
+
+
+class QualityRejected(ValueError):
+    """Raised when an image fails the quality gate"""
+
+    def __init__(self, reason: str, message: str, metrics: Dict[str, float]):
+        # Keep all arguments in args so the exception pickles across processes
+        super().__init__(reason, message, metrics)
+        self.reason = reason
+        self.message = message
+        self.metrics = metrics
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def face_region(image_rgb: np.ndarray, face_location: tuple) -> np.ndarray:
+    """
+    View of the face box, clipped to the image
+
+    Args:
+        image_rgb: Image in RGB format
+        face_location: (top, right, bottom, left) in image pixels
+
+    Returns:
+        np.ndarray: The box contents (no copy)
+    """
+    height, width = image_rgb.shape[:2]
+    top, right, bottom, left = face_location
+    top, bottom = max(0, top), min(height, bottom)
+    left, right = max(0, left), min(width, right)
+    if bottom <= top or right <= left:
+        raise ValueError(f"Face box {face_location} lies outside the {width}x{height} image")
+    return image_rgb[top:bottom, left:right]
+
+
+def image_metrics(image_rgb: np.ndarray, face_location: Optional[tuple] = None) -> Dict[str, float]:
+    """
+    Sharpness and exposure measurements of a decoded image
+
+    Args:
+        image_rgb: Image in RGB format (uint8)
+        face_location: (top, right, bottom, left); measure only this box
+            instead of the whole image
+
+    Returns:
+        Dict[str, float]: sharpness (Laplacian variance), brightness (mean
+        gray level) and the fractions of near-black and near-white pixels
+    """
+    if face_location is not None:
+        image_rgb = face_region(image_rgb, face_location)
+    gray = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2GRAY)
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    total = max(hist.sum(), 1.0)
+    return {
+        "sharpness": float(std[0][0] ** 2),
+        "brightness": float(np.dot(hist, np.arange(256)) / total),
+        "dark_fraction": float(hist[:16].sum() / total),
+        "bright_fraction": float(hist[240:].sum() / total)
+    }
+
+
+class QualityGate:
+    """
+    Threshold checks for the face in a decoded image
+
+    check raises QualityRejected and may run in
+    encode worker processes; record() keeps the rejection counters and
+    must be called where results come back (the API process), so the
+    counters cover every worker.
+    """
+
+    def __init__(self, min_sharpness: float = 20.0, min_brightness: float = 40.0,
+                 max_brightness: float = 220.0, max_clipped: float = 0.5,
+                 min_face_size: int = 48):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_clipped = max_clipped
+        self.min_face_size = min_face_size
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._rejected = dict.fromkeys(REASONS, 0)
+
+    def check(self, image_rgb: np.ndarray, face_location: tuple) -> Dict[str, float]:
+        """
+        Reject a face that is too small, badly exposed or blurry
+
+        Args:
+            image_rgb: Preprocessed image in RGB format (uint8)
+            face_location: (top, right, bottom, left) in preprocessed pixels
+
+        Returns:
+            Dict[str, float]: The face box metrics (when the face passes)
+
+        Raises:
+            QualityRejected: If any threshold is violated
+        """
+        top, right, bottom, left = face_location
+        size = min(bottom - top, right - left)
+        if size < self.min_face_size:
+            raise QualityRejected(
+                "face_too_small",
+                f"Face too small ({size}px), move closer to the camera",
+                {"face_size": float(size)})
+
+        metrics = image_metrics(image_rgb, face_location)
+        metrics["face_size"] = float(size)
+
+        if metrics["brightness"] < self.min_brightness or metrics["dark_fraction"] > self.max_clipped:
+            raise QualityRejected(
+                "too_dark",
+                f"Face too dark (brightness {metrics['brightness']:.0f}), add more light",
+                metrics)
+        if metrics["brightness"] > self.max_brightness or metrics["bright_fraction"] > self.max_clipped:
+            raise QualityRejected(
+                "too_bright",
+                f"Face overexposed (brightness {metrics['brightness']:.0f}), reduce glare or backlight",
+                metrics)
+        # Checked after exposure: a dark face also has little edge energy
+        if metrics["sharpness"] < self.min_sharpness:
+            raise QualityRejected(
+                "blurry",
+                f"Face too blurry (sharpness {metrics['sharpness']:.1f}), hold the camera still",
+                metrics)
+        return metrics
+
+    def record(self, result: Any):
+        """Count one pipeline result (embedding, None or exception)"""
+        with self._lock:
+            if isinstance(result, QualityRejected):
+                self._rejected[result.reason] = self._rejected.get(result.reason, 0) + 1
+            elif result is None or isinstance(result, Exception):
+                # No face or a decode error: the gate never ran
+                return
+            self._checked += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rejected = sum(self._rejected.values())
+            return {
+                "thresholds": {
+                    "min_sharpness": self.min_sharpness,
+                    "min_brightness": self.min_brightness,
+                    "max_brightness": self.max_brightness,
+                    "max_clipped": self.max_clipped,
+                    "min_face_size": self.min_face_size
+                },
+                "checked": self._checked,
+                "rejected": rejected,
+                "rejected_by_reason": dict(self._rejected),
+                "rejection_rate": round(rejected / self._checked, 4) if self._checked else None
+            }
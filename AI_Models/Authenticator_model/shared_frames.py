@@ -0,0 +1,223 @@
+"""
+Shared-memory hand-off of large buffers to encode pool workers.
+
+ProcessPoolExecutor pickles every argument: the parent serializes it, the
+bytes go through a pipe, and the worker rebuilds them, which costs three
+copies and a pipe transfer for every multi-megabyte upload. SlabPool
+instead copies the buffer once into a reusable
+multiprocessing.shared_memory segment (a slab) and sends only a small
+handle. The worker maps the slab by name for the duration of the job
+and reads it in place.
+
+Both raw bytes (uploads) and numpy arrays (decoded frames) can be
+shared. A slab is reused once the job that borrowed it has finished.
+Slabs live in /dev/shm, which is often small in containers (64MB by
+default under Docker), so the pool caps their total size and unlinks
+slabs that sit idle; past the cap, buffers are pickled as before.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Slabs are sized in whole multiples of this, so they can be reused
+SLAB_GRANULE = 1 << 20
+
+
+class SharedBuffer(NamedTuple):
+    """Picklable handle to a buffer placed in a slab"""
+    name: str
+    nbytes: int
+    # None for raw bytes, else the shape/dtype of a numpy array
+    shape: Optional[Tuple[int, ...]] = None
+    dtype: Optional[str] = None
+
+
+class SlabPool:
+    """
+    Reusable shared-memory slabs, owned by the API process
+
+    Args:
+        min_bytes: Buffers smaller than this are cheaper to pickle
+        max_slabs: Most slabs alive at once; beyond it buffers are pickled
+        max_bytes: Most bytes of slabs alive at once; beyond it buffers are pickled
+        idle_seconds: Free slabs unused for this long are unlinked
+    """
+
+    def __init__(self, min_bytes: int = 256 * 1024, max_slabs: int = 64,
+                 max_bytes: int = 32 * 1024 * 1024, idle_seconds: float = 60.0):
+        self.min_bytes = min_bytes
+        self.max_slabs = max_slabs
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        # Free slabs with the time they were returned, oldest first
+        self._free: List[Tuple[shared_memory.SharedMemory, float]] = []
+        self._all: Dict[str, shared_memory.SharedMemory] = {}
+        self._bytes = 0
+        self._shared = 0
+        self._pickled = 0
+        self._created = 0
+        self._unlinked = 0
+        atexit.register(self.close)
+
+    def _unlink(self, slab: shared_memory.SharedMemory):
+        """Forget a free slab and remove it from /dev/shm (lock held)"""
+        del self._all[slab.name]
+        self._bytes -= slab.size
+        self._unlinked += 1
+        try:
+            slab.close()
+            slab.unlink()
+        except (BufferError, FileNotFoundError) as e:
+            logger.warning(f"Could not release shared slab {slab.name}: {str(e)}")
+
+    def _trim(self, now: float):
+        """Unlink free slabs idle for longer than idle_seconds (lock held)"""
+        while self._free and now - self._free[0][1] > self.idle_seconds:
+            slab, _ = self._free.pop(0)
+            self._unlink(slab)
+
+    def _acquire(self, nbytes: int) -> Optional[shared_memory.SharedMemory]:
+        with self._lock:
+            self._trim(time.monotonic())
+
+            # Smallest free slab that fits
+            fits = [entry for entry in self._free if entry[0].size >= nbytes]
+            if fits:
+                entry = min(fits, key=lambda e: e[0].size)
+                self._free.remove(entry)
+                return entry[0]
+
+            size = -(-nbytes // SLAB_GRANULE) * SLAB_GRANULE
+            if size > self.max_bytes:
+                return None
+            # Make room by dropping free slabs too small for this buffer
+            while self._free and (self._bytes + size > self.max_bytes
+                                  or len(self._all) >= self.max_slabs):
+                slab, _ = self._free.pop(0)
+                self._unlink(slab)
+            if self._bytes + size > self.max_bytes or len(self._all) >= self.max_slabs:
+                return None
+
+            slab = shared_memory.SharedMemory(create=True, size=size)
+            self._all[slab.name] = slab
+            self._bytes += slab.size
+            self._created += 1
+            return slab
+
+    def release(self, leases: List[shared_memory.SharedMemory]):
+        """Return slabs borrowed by share() once the job has finished"""
+        now = time.monotonic()
+        with self._lock:
+            for slab in leases:
+                if slab.name in self._all:
+                    self._free.append((slab, now))
+            self._trim(now)
+
+    def share(self, value: Any, leases: List[shared_memory.SharedMemory]) -> Any:
+        """
+        Replace large bytes/arrays (also inside lists and tuples) with handles
+
+        Args:
+            value: A job argument
+            leases: Slabs used are appended here; pass them to release()
+
+        Returns:
+            Any: value, with large buffers swapped for SharedBuffer handles
+        """
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.share(v, leases) for v in value)
+
+        if isinstance(value, (bytes, bytearray)):
+            data, shape, dtype = memoryview(value), None, None
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            data, shape, dtype = memoryview(np.ascontiguousarray(value)).cast("B"), value.shape, value.dtype.str
+        else:
+            return value
+
+        if data.nbytes < self.min_bytes:
+            return value
+        slab = self._acquire(data.nbytes)
+        if slab is None:
+            with self._lock:
+                self._pickled += 1
+            return value
+
+        slab.buf[:data.nbytes] = data
+        leases.append(slab)
+        with self._lock:
+            self._shared += 1
+        return SharedBuffer(slab.name, data.nbytes, shape, dtype)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "slabs": len(self._all),
+                "free": len(self._free),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "created": self._created,
+                "unlinked": self._unlinked,
+                "shared": self._shared,
+                "pickled_overflow": self._pickled
+            }
+
+    def close(self):
+        """Unlink every slab (workers must be done with them)"""
+        with self._lock:
+            slabs, self._all, self._free = list(self._all.values()), {}, []
+            self._bytes = 0
+        for slab in slabs:
+            try:
+                slab.close()
+                slab.unlink()
+            except (BufferError, FileNotFoundError) as e:
+                logger.warning(f"Could not release shared slab {slab.name}: {str(e)}")
+
+
+# ---------- worker side ----------
+
+
+def resolve(value: Any, opened: List[shared_memory.SharedMemory]) -> Any:
+    """
+    Swap SharedBuffer handles (also inside lists and tuples) for views
+
+    Raw bytes come back as a memoryview and arrays as numpy arrays, both
+    reading the slab in place. Slabs mapped for this are appended to
+    opened; pass it to detach() once the job returns.
+    """
+    if isinstance(value, SharedBuffer):
+        # Pool workers share the API process's resource tracker, so this
+        # registration is a no-op and the owner's unlink() settles it
+        slab = shared_memory.SharedMemory(name=value.name)
+        opened.append(slab)
+        view = slab.buf[:value.nbytes]
+        if value.shape is None:
+            return view
+        return np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=view)
+    if isinstance(value, (list, tuple)):
+        return type(value)(resolve(v, opened) for v in value)
+    return value
+
+
+def detach(opened: List[shared_memory.SharedMemory]):
+    """
+    Unmap slabs mapped by resolve()
+
+    Workers must not keep mappings: a slab the owner unlinks only frees
+    its /dev/shm pages once every process has unmapped it.
+    """
+    for slab in opened:
+        try:
+            slab.close()
+        except BufferError:
+            # A view outlived the job; the mapping goes when it is collected
+            logger.warning(f"Shared slab {slab.name} still referenced after the job")
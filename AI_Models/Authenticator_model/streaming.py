@@ -0,0 +1,54 @@
+"""
+Frame hand-off for streaming (WebSocket) verification.
+
+A continuous-authentication client sends frames at its own pace while
+the server encodes them one at a time. Queueing would make every result
+describe an older and older frame once the encoder falls behind, so the
+receiver and the processor share a single slot instead: a frame that is
+still waiting when a newer one arrives is dropped.
+"""
+
+import asyncio
+from typing import Any, Optional
+
+
+class LatestFrame:
+    """Single-slot mailbox in which a newer frame replaces a waiting one"""
+
+    def __init__(self):
+        self._frame: Optional[Any] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: Any) -> bool:
+        """
+        Offer a frame to the processor
+
+        Returns:
+            bool: True if a waiting (stale) frame was dropped to make room
+        """
+        self.received += 1
+        stale = self._frame is not None
+        if stale:
+            self.dropped += 1
+        self._frame = frame
+        self._event.set()
+        return stale
+
+    async def get(self) -> Optional[Any]:
+        """Wait for the newest frame; None once closed"""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+    def close(self):
+        """Discard any waiting frame and make get() return None"""
+        self._closed = True
+        self._frame = None
+        self._event.set()
@@ -0,0 +1,15 @@
+"""
+Shared setup for the authenticator tests.
+
+Tests import the service modules directly, so run them from any
+directory: the Authenticator_model folder is put on sys.path here.
+
+    python -m pytest AI_Models/Authenticator_model/tests -q
+"""
+
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
@@ -0,0 +1,28 @@
+"""embedding_format only accepts the encodings the service can produce."""
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as service
+
+
+def _files(name="files"):
+    image = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    return [(name, ("a.jpg", cv2.imencode(".jpg", image)[1].tobytes(), "image/jpeg"))]
+
+
+@pytest.mark.parametrize("path,field", [("/encode", "file"), ("/encode-batch", "files")])
+def test_unknown_format_is_422(path, field):
+    response = TestClient(service.app).post(
+        path, params={"embedding_format": "xml"}, files=_files(field))
+    assert response.status_code == 422
+
+
+def test_base64_format():
+    response = TestClient(service.app).post(
+        "/encode", params={"embedding_format": "base64"}, files=_files("file"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["embedding_b64"] and body["embedding"] is None
@@ -0,0 +1,35 @@
+"""/encode, /encode-batch and /verify-burst share encode cache entries."""
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app as service
+from cache import EncodingCache
+
+
+def _jpeg() -> bytes:
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def test_unhinted_key_matches_across_endpoints():
+    content = _jpeg()
+    assert service.encode_cache_key(content) == service.encode_cache_key(content, None, False)
+    assert service.encode_cache_key(content) != service.encode_cache_key(content, pre_cropped=True)
+
+
+def test_batch_hits_entry_cached_by_encode(monkeypatch):
+    monkeypatch.setattr(service, "encode_cache", EncodingCache(max_entries=16))
+    client = TestClient(service.app)
+    content = _jpeg()
+
+    response = client.post("/encode", files={"file": ("a.jpg", content, "image/jpeg")})
+    assert response.status_code == 200 and response.json()["success"]
+    response = client.post("/encode-batch", files=[("files", ("a.jpg", content, "image/jpeg"))])
+    assert response.status_code == 200
+
+    stats = service.encode_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
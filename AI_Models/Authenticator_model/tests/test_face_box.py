@@ -0,0 +1,50 @@
+"""Client face boxes that do not fit the image are rejected with a 400."""
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as service
+from workers import EncodePool
+
+
+def _jpeg() -> bytes:
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+@pytest.fixture(params=["inline", "process"])
+def client(request, monkeypatch):
+    monkeypatch.setattr(service, "encode_cache", None)
+    if request.param == "process":
+        pool = EncodePool(max_workers=1)
+        monkeypatch.setattr(service, "encode_pool", pool)
+        yield TestClient(service.app)
+        pool.shutdown()
+    else:
+        monkeypatch.setattr(service, "encode_pool", None)
+        yield TestClient(service.app)
+
+
+def _encode(client, face_box):
+    return client.post("/encode", files={"file": ("a.jpg", _jpeg(), "image/jpeg")},
+                       data={"face_box": face_box})
+
+
+@pytest.mark.parametrize("face_box", ["1,2,3", "a,b,c,d", "0,0,nan,100"])
+def test_malformed_box(client, face_box):
+    assert _encode(client, face_box).status_code == 400
+
+
+@pytest.mark.parametrize("face_box", ["500,400,100,100", "-200,0,100,100", "0,0,-10,100"])
+def test_box_outside_image(client, face_box):
+    response = _encode(client, face_box)
+    assert response.status_code == 400
+    assert "Invalid face box" in response.json()["detail"]
+
+
+def test_box_inside_image(client):
+    response = _encode(client, "100,60,120,120")
+    assert response.status_code == 200 and response.json()["success"]
@@ -0,0 +1,31 @@
+"""/metrics exports running totals as counters."""
+
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+import app as service
+from cache import EncodingCache
+
+
+def _sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.split(" ")[0] == name:
+            return float(line.split(" ")[1])
+    raise AssertionError(f"{name} not exported")
+
+
+def test_cache_hits_and_misses_are_counters(monkeypatch):
+    monkeypatch.setattr(service, "encode_cache", EncodingCache(max_entries=16))
+    client = TestClient(service.app)
+    image = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    content = cv2.imencode(".jpg", image)[1].tobytes()
+    for _ in range(3):
+        client.post("/encode", files={"file": ("a.jpg", content, "image/jpeg")})
+
+    text = client.get("/metrics").text
+    assert "# TYPE face_auth_encode_cache_hits_total counter" in text
+    assert "# TYPE face_auth_encode_cache_misses_total counter" in text
+    assert _sample(text, "face_auth_encode_cache_hits_total") == 2
+    assert _sample(text, "face_auth_encode_cache_misses_total") == 1
+    assert _sample(text, 'face_auth_encode_cache{field="entries"}') == 1
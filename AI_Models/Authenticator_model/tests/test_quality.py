@@ -0,0 +1,48 @@
+"""The quality gate judges the face box, not the whole frame."""
+
+import numpy as np
+import pytest
+
+from quality import QualityGate, QualityRejected
+
+FACE = (100, 300, 300, 100)
+
+
+def _frame(background: int, face: int) -> np.ndarray:
+    """Textured frame with a flat-lit square 'face' of another gray level"""
+    rng = np.random.default_rng(0)
+    image = np.clip(rng.normal(background, 20, (400, 400, 3)), 0, 255).astype(np.uint8)
+    top, right, bottom, left = FACE
+    image[top:bottom, left:right] = np.clip(
+        rng.normal(face, 20, (bottom - top, right - left, 3)), 0, 255).astype(np.uint8)
+    return image
+
+
+def test_backlit_face_is_too_dark():
+    image = _frame(background=200, face=25)
+    assert QualityGate().check(image, (0, 400, 400, 0))["brightness"] > 40
+    with pytest.raises(QualityRejected) as rejected:
+        QualityGate().check(image, FACE)
+    assert rejected.value.reason == "too_dark"
+
+
+def test_dark_background_does_not_reject_a_lit_face():
+    image = _frame(background=0, face=130)
+    with pytest.raises(QualityRejected):
+        QualityGate().check(image, (0, 400, 400, 0))
+    assert QualityGate().check(image, FACE)["brightness"] > 100
+
+
+def test_blurry_face_in_a_sharp_frame():
+    image = _frame(background=130, face=130)
+    top, right, bottom, left = FACE
+    image[top:bottom, left:right] = 130
+    with pytest.raises(QualityRejected) as rejected:
+        QualityGate().check(image, FACE)
+    assert rejected.value.reason == "blurry"
+
+
+def test_small_face_is_rejected_before_measuring():
+    with pytest.raises(QualityRejected) as rejected:
+        QualityGate(min_face_size=48).check(_frame(130, 130), (10, 40, 40, 10))
+    assert rejected.value.reason == "face_too_small"
@@ -0,0 +1,36 @@
+"""Template updates on /match/{user_id} must keep per-user rows bounded."""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as service
+from gallery import EmbeddingGallery
+
+
+def _match_repeatedly(monkeypatch, max_exemplars, matches=50):
+    monkeypatch.setattr(service, "TEMPLATE_UPDATE_ON_MATCH", True)
+    monkeypatch.setattr(service, "gallery", EmbeddingGallery(max_exemplars=max_exemplars))
+    rng = np.random.default_rng(0)
+    enrolled = rng.normal(0, 0.05, 128).astype(np.float32)
+
+    client = TestClient(service.app)
+    response = client.post("/enroll/u1", json={"embeddings": [enrolled.tolist()]})
+    assert response.status_code == 200
+    for _ in range(matches):
+        probe = enrolled + rng.normal(0, 0.005, 128).astype(np.float32)
+        response = client.post("/match/u1", json={"new_embedding": probe.tolist()})
+        assert response.status_code == 200 and response.json()["match"]
+    return service.gallery.get("u1")
+
+
+@pytest.mark.parametrize("max_exemplars", [2, 8])
+def test_updates_keep_consolidated_rows_bounded(monkeypatch, max_exemplars):
+    templates = _match_repeatedly(monkeypatch, max_exemplars)
+    assert len(templates) <= max_exemplars + 1
+    assert templates.observations == 51
+
+
+def test_updates_are_skipped_without_consolidation(monkeypatch):
+    templates = _match_repeatedly(monkeypatch, max_exemplars=0)
+    assert len(templates) == 1
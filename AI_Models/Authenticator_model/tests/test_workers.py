@@ -0,0 +1,55 @@
+"""A failed process job must not keep its shared slabs mapped."""
+
+import asyncio
+import logging
+import os
+
+import pytest
+
+import app as service
+import shared_frames
+import workers
+from shared_frames import SlabPool
+from workers import EncodePool
+
+# Starts like a JPEG so decoding gets past the header sniffing
+CORRUPT_JPEG = b"\xff\xd8\xff\xe0" + b"\x00corrupt" * 100000
+
+
+def test_failed_job_detaches_its_slabs(caplog):
+    slab_pool = SlabPool(min_bytes=1)
+    leases = []
+    handle = slab_pool.share(CORRUPT_JPEG, leases)
+    try:
+        with caplog.at_level(logging.WARNING, logger=shared_frames.__name__):
+            ok, error, _ = workers._run_job(service.encode_image_bytes, handle)
+        assert not ok and isinstance(error, ValueError)
+        assert error.__traceback__ is None
+        assert "still referenced" not in caplog.text
+    finally:
+        slab_pool.release(leases)
+        slab_pool.close()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self"), reason="needs /proc to see worker mappings")
+def test_corrupt_jpeg_in_process_mode_leaves_no_mapping():
+    slab_pool = SlabPool(min_bytes=1)
+    pool = EncodePool(max_workers=1, slab_pool=slab_pool)
+    try:
+        async def run_jobs():
+            # Fork the worker first so it cannot inherit the slab mapping
+            await pool.run(os.getpid)
+            await pool.run(service.encode_image_bytes, CORRUPT_JPEG)
+
+        with pytest.raises(ValueError):
+            asyncio.run(run_jobs())
+        assert pool.stats()["in_flight"] == 0
+
+        slab_names = [entry[0].name for entry in slab_pool._free]
+        assert slab_names
+        for pid in pool._executor._processes:
+            with open(f"/proc/{pid}/maps") as maps:
+                mapped = maps.read()
+            assert not any(name in mapped for name in slab_names)
+    finally:
+        pool.shutdown()
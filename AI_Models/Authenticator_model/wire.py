@@ -0,0 +1,68 @@
+"""
+Compact wire formats for embeddings.
+
+JSON arrays of floats cost ~2.5KB of text per 128-d embedding and a
+pydantic validation per element. Endpoints that move embeddings also
+accept and return them as little-endian float32, either raw
+(application/octet-stream) or base64-encoded inside JSON.
+"""
+
+import base64
+import binascii
+from typing import Optional
+
+import numpy as np
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+# Embeddings on the wire are always little-endian float32
+WIRE_DTYPE = np.dtype("<f4")
+
+
+def from_bytes(buffer: bytes, dim: Optional[int] = None) -> np.ndarray:
+    """
+    Parse concatenated float32 embeddings
+
+    Args:
+        buffer: Raw little-endian float32 bytes
+        dim: Embedding dimension (None = the buffer is a single embedding)
+
+    Returns:
+        np.ndarray: (n, dim) float32 matrix (read-only view of buffer)
+    """
+    if dim is None:
+        dim = max(1, len(buffer) // WIRE_DTYPE.itemsize)
+    row_bytes = dim * WIRE_DTYPE.itemsize
+    if not buffer or len(buffer) % row_bytes:
+        raise ValueError(
+            f"Binary payload of {len(buffer)} bytes is not a whole number of "
+            f"{dim}-d float32 embeddings")
+    return np.frombuffer(buffer, dtype=WIRE_DTYPE).reshape(-1, dim).astype(np.float32, copy=False)
+
+
+def to_bytes(embeddings) -> bytes:
+    """Serialize one or more embeddings as little-endian float32"""
+    return np.ascontiguousarray(embeddings, dtype=WIRE_DTYPE).tobytes()
+
+
+def from_b64(text: str, dim: Optional[int] = None) -> np.ndarray:
+    """Parse base64-encoded float32 embeddings into an (n, dim) matrix"""
+    try:
+        buffer = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 embedding: {str(e)}")
+    return from_bytes(buffer, dim)
+
+
+def to_b64(embeddings) -> str:
+    """Serialize one or more embeddings as base64 float32"""
+    return base64.b64encode(to_bytes(embeddings)).decode("ascii")
+
+
+def is_binary(content_type: Optional[str]) -> bool:
+    """Whether a Content-Type header announces a raw float32 body"""
+    return bool(content_type) and content_type.split(";")[0].strip().lower() == BINARY_MEDIA_TYPE
+
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for a raw float32 response"""
+    return bool(accept) and BINARY_MEDIA_TYPE in accept.lower()
@@ -0,0 +1,204 @@
+"""
+Process-pool execution for the CPU-bound encode pipeline.
+
+dlib detection and encoding hold the interpreter for hundreds of
+milliseconds, so running them inline in an async endpoint stalls every
+other request on the uvicorn worker (including /health). EncodePool runs
+them in a pool of worker processes behind a bounded queue and rejects
+work once the queue is full instead of letting latency grow unbounded.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+import shared_frames
+from shared_frames import SlabPool
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    """Number of CPU cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class PoolUnavailable(Exception):
+    """Raised when the pool cannot run a job right now; callers should retry"""
+
+
+class PoolSaturated(PoolUnavailable):
+    """Raised when the pool's bounded queue is full"""
+
+
+class PoolBroken(PoolUnavailable):
+    """Raised when a worker died mid-job; the pool is recreated for later jobs"""
+
+
+def _drop_frames(error: BaseException):
+    """
+    Clear the frames an exception's traceback keeps alive
+
+    The frames of a failed job still hold its locals, including views of
+    the slabs it was reading, and detach() cannot unmap a slab while a
+    view exists. The traceback is not sent back to the API process anyway.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        traceback.clear_frames(error.__traceback__)
+        error.__traceback__ = None
+        error = error.__cause__ or error.__context__
+
+
+def _run_job(fn: Callable, *args):
+    """Worker entry point: map shared buffers, run fn and collect its metrics"""
+    opened = []
+    try:
+        ok, result, recorded = metrics.run_collected(fn, *shared_frames.resolve(args, opened))
+        if not ok:
+            _drop_frames(result)
+        return ok, result, recorded
+    finally:
+        shared_frames.detach(opened)
+
+
+class EncodePool:
+    """
+    Bounded process pool for decode/detect/encode jobs
+
+    At most max_workers jobs run at once and at most max_queue more wait
+    for a free worker; anything beyond that raises PoolSaturated. With a
+    slab_pool, large bytes/array arguments travel through shared memory
+    instead of being pickled.
+    """
+
+    def __init__(self, max_workers: int = 0, max_queue: int = 0,
+                 slab_pool: Optional[SlabPool] = None):
+        self.max_workers = max_workers if max_workers > 0 else available_cores()
+        self.max_queue = max_queue if max_queue > 0 else 2 * self.max_workers
+        self.slab_pool = slab_pool
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # fork keeps already-imported modules (and dlib models) warm
+                    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(method)
+                    )
+                    logger.info(
+                        f"Started encode pool: {self.max_workers} workers, "
+                        f"queue size {self.max_queue}")
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor so the next job starts fresh workers"""
+        with self._lock:
+            if self._executor is not executor:
+                # Another job already replaced it
+                return
+            self._executor = None
+            self._restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.error("Encode pool worker died; pool will be recreated")
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturated(
+                    f"Encode queue full ({self._in_flight} jobs in flight)")
+            self._in_flight += 1
+
+    def _release(self, leases: list):
+        """Free a job's queue slot and shared buffers once its process job is done"""
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        if leases:
+            self.slab_pool.release(leases)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run fn(*args) in a worker process without blocking the event loop
+
+        Args:
+            fn: Module-level (picklable) function
+            *args: Picklable arguments
+
+        Returns:
+            Any: fn's return value; exceptions raised by fn are re-raised.
+            Metrics fn records in the worker are merged into this process.
+
+        Raises:
+            PoolSaturated: If the bounded queue is full
+            PoolBroken: If a worker process died while the job was pending
+        """
+        self._acquire()
+        leases = []
+        executor = None
+        try:
+            if self.slab_pool is not None:
+                args = tuple(self.slab_pool.share(arg, leases) for arg in args)
+            executor = self._get_executor()
+            future = executor.submit(_run_job, fn, *args)
+        except BaseException as e:
+            self._release(leases)
+            if isinstance(e, BrokenProcessPool):
+                self._discard_executor(executor)
+                raise PoolBroken(f"Encode worker died: {str(e)}") from e
+            raise
+        # The slot and the slabs belong to the process job, not to this
+        # coroutine: a client disconnect cancels the await, but a job that
+        # is already running keeps reading its slabs until it finishes
+        future.add_done_callback(lambda _: self._release(leases))
+
+        try:
+            ok, result, recorded = await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            self._discard_executor(executor)
+            raise PoolBroken(f"Encode worker died: {str(e)}") from e
+
+        metrics.registry.merge(recorded)
+        if not ok:
+            raise result
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "workers": self.max_workers,
+                "queue_size": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "restarts": self._restarts
+            }
+        stats["shared_memory"] = self.slab_pool.stats() if self.slab_pool else None
+        return stats
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.slab_pool is not None:
+            self.slab_pool.close()
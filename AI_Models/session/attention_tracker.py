@@ -2,19 +2,18 @@ import cv2
 import time
 import numpy as np
 from collections import deque
-from face_landmarks import get_landmarks
+from face_landmarks import FaceTracker, get_landmarks
 from scoring import attention_score, get_nose_position, face_center_score
 from utils import distance
+from config import (STABLE_MOVEMENT_THRESHOLD, MAX_MOVEMENT_THRESHOLD, STABILITY_WINDOW,
+                    STABILITY_MIN_HISTORY, BASE_SCORE_WEIGHT, STABILITY_SCORE_WEIGHT,
+                    CENTER_SCORE_WEIGHT)
 
 # ============ CONFIGURATION ============
 FRAME_SKIP = 2                    # Process every Nth frame (performance boost)
 FACE_TOLERANCE_SECONDS = 2        # Seconds to tolerate missing face
 SMOOTHING_WINDOW = 10             # Frames for moving average
-STABILITY_HISTORY_SIZE = 15       # Frames to track for head stability
-
-# Head stability thresholds
-STABLE_MOVEMENT_THRESHOLD = 5     # Pixels - very stable
-MAX_MOVEMENT_THRESHOLD = 25       # Pixels - too much movement
+# Head stability thresholds and score weights live in config.py
 
 # ============ INITIALIZATION ============
 cap = cv2.VideoCapture(0)
@@ -27,9 +26,12 @@ frame_counter = 0
 # Face tolerance
 last_face_detected_time = time.time()
 
+# Face tracking: search near the last face instead of the whole frame
+face_tracker = FaceTracker()
+
 # Head stability tracking
 previous_nose_position = None
-movement_history = deque(maxlen=STABILITY_HISTORY_SIZE)
+movement_history = deque(maxlen=STABILITY_WINDOW)
 
 # Session timing
 session_start_time = time.time()
@@ -41,7 +43,7 @@ if not cap.isOpened():
 
 def get_head_stability_score():
     """Calculate head stability based on recent movement."""
-    if len(movement_history) < 5:
+    if len(movement_history) < STABILITY_MIN_HISTORY:
         return 1.0  # Not enough data, assume stable
     
     avg_movement = sum(movement_history) / len(movement_history)
@@ -107,7 +109,7 @@ while True:
             break
         continue
 
-    landmarks = get_landmarks(frame)
+    landmarks = get_landmarks(frame, face_tracker)
     score = 0
     stability_score = 1.0
     center_score = 1.0
@@ -135,9 +137,9 @@ while True:
         # base_score already includes gaze, head pose, eye openness
         # Now we add stability and centering
         score = (
-            0.60 * base_score +
-            0.25 * stability_score +
-            0.15 * center_score
+            BASE_SCORE_WEIGHT * base_score +
+            STABILITY_SCORE_WEIGHT * stability_score +
+            CENTER_SCORE_WEIGHT * center_score
         )
 
     else:
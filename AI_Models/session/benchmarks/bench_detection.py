@@ -0,0 +1,178 @@
+"""
+Frames/sec versus detection recall at each face-detection working resolution.
+
+Every frame is first searched at full resolution (DETECTION_WIDTH=0); that
+box is the reference. Each level in --widths is then timed on the same
+frames and scored by how many reference faces it finds again (IoU >= 0.3).
+With --track the levels are also run through a FaceTracker, as the live
+session does.
+
+Frames come from a webcam recording, or are synthesized by moving a face
+photo over a blurred background at each --sizes resolution:
+
+    python benchmarks/bench_detection.py --video webcam.mp4 --widths 0,960,640,480,320
+    python benchmarks/bench_detection.py --face me.jpg --sizes 1280x720,1920x1080 --track
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+SESSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SESSION_DIR not in sys.path:
+    sys.path.insert(0, SESSION_DIR)
+
+import face_landmarks  # noqa: E402
+
+
+def read_video(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+def synthetic_frames(face_path, width, height, count, face_fraction, seed=0):
+    """A face photo drifting (and slightly zooming) over a blurred background"""
+    photo = cv2.imread(face_path)
+    if photo is None:
+        raise ValueError(f"Could not read {face_path}")
+    face_landmarks.DETECTION_WIDTH = 0
+    box = face_landmarks.detect_face(cv2.cvtColor(photo, cv2.COLOR_BGR2GRAY))
+    if box is None:
+        raise ValueError(f"No face found in {face_path}")
+
+    # Head and shoulders around the face, sized so the face box is face_fraction of the height
+    fx, fy, fw, fh = box
+    margin = fw // 2
+    face = photo[max(0, fy - margin):fy + fh + margin, max(0, fx - margin):fx + fw + margin]
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(cv2.resize(photo, (width, height)), (0, 0), 25)
+
+    side = face_fraction * height * face.shape[0] / fh
+    x, y, zoom = width / 2, height / 2, 1.0
+    frames = []
+    for _ in range(count):
+        x = np.clip(x + rng.normal(0, width / 300), width * 0.3, width * 0.7)
+        y = np.clip(y + rng.normal(0, height / 300), height * 0.35, height * 0.65)
+        zoom = np.clip(zoom + rng.normal(0, 0.01), 0.85, 1.15)
+        scale = side * zoom / max(face.shape[:2])
+        patch = cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ph, pw = patch.shape[:2]
+        x0 = int(np.clip(x - pw / 2, 0, width - pw))
+        y0 = int(np.clip(y - ph / 2, 0, height - ph))
+        frame = background.copy()
+        frame[y0:y0 + ph, x0:x0 + pw] = patch
+        frames.append(frame)
+    return frames
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def run_level(grays, width, track):
+    face_landmarks.DETECTION_WIDTH = width
+    tracker = face_landmarks.FaceTracker() if track else None
+    boxes, samples = [], []
+    for gray in grays:
+        start = time.perf_counter()
+        box = tracker.detect(gray) if tracker else face_landmarks.detect_face(gray)
+        samples.append(time.perf_counter() - start)
+        boxes.append(box)
+    return boxes, samples
+
+
+def score_level(boxes, samples, reference, full_ms):
+    found = sum(1 for box, ref in zip(boxes, reference)
+                if ref is not None and box is not None and iou(box, ref) >= 0.3)
+    positives = sum(ref is not None for ref in reference)
+    mean_ms = float(np.mean(samples)) * 1000.0
+    return {
+        "mean_ms": round(mean_ms, 2),
+        "p99_ms": round(float(np.percentile(samples, 99)) * 1000.0, 2),
+        "fps": round(1000.0 / mean_ms, 1),
+        "speedup": round(full_ms / mean_ms, 2),
+        "recall": round(found / positives, 4) if positives else None,
+        "extra_detections": sum(1 for box, ref in zip(boxes, reference)
+                                if ref is None and box is not None),
+    }
+
+
+def bench_frames(frames, widths, track):
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    reference, full_samples = run_level(grays, 0, track=False)
+    full_ms = float(np.mean(full_samples)) * 1000.0
+
+    report = {
+        "frames": len(frames),
+        "resolution": f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+        "reference_faces": sum(ref is not None for ref in reference),
+        "levels": {},
+    }
+    for width in widths:
+        name = "full" if width == 0 else str(width)
+        boxes, samples = ((reference, full_samples) if width == 0
+                          else run_level(grays, width, track=False))
+        report["levels"][name] = score_level(boxes, samples, reference, full_ms)
+        if track:
+            boxes, samples = run_level(grays, width, track=True)
+            report["levels"][name + "+track"] = score_level(boxes, samples, reference, full_ms)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="Webcam recording to read frames from")
+    source.add_argument("--face", help="Face photo to synthesize moving-face frames from")
+    parser.add_argument("--sizes", default="640x480,1280x720,1920x1080", help="Synthetic resolutions")
+    parser.add_argument("--face-fraction", type=float, default=0.3,
+                        help="Synthetic face size, as a fraction of the frame height")
+    parser.add_argument("--frames", type=int, default=120, help="Frames per resolution")
+    parser.add_argument("--widths", default="0,960,640,480,320",
+                        help="Detection working widths to compare (0 = full resolution)")
+    parser.add_argument("--track", action="store_true", help="Also run each level with a FaceTracker")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    widths = [int(w) for w in args.widths.split(",")]
+    report = {
+        "face_min_fraction": face_landmarks.FACE_MIN_FRACTION,
+        "face_max_fraction": face_landmarks.FACE_MAX_FRACTION,
+        "runs": [],
+    }
+    if args.video:
+        report["runs"].append(bench_frames(read_video(args.video, args.frames), widths, args.track))
+    else:
+        for size in args.sizes.split(","):
+            width, height = (int(v) for v in size.split("x"))
+            frames = synthetic_frames(args.face, width, height, args.frames, args.face_fraction)
+            report["runs"].append(bench_frames(frames, widths, args.track))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,3 +10,29 @@ GAZE_WEIGHT = 0.4
 HEAD_WEIGHT = 0.3
 EYE_WEIGHT = 0.2
 FACE_WEIGHT = 0.1
+
+# Head stability (pixels of nose movement between processed frames)
+STABLE_MOVEMENT_THRESHOLD = 5
+MAX_MOVEMENT_THRESHOLD = 25
+STABILITY_WINDOW = 15
+STABILITY_MIN_HISTORY = 5
+
+# Combined per-frame score
+BASE_SCORE_WEIGHT = 0.60
+STABILITY_SCORE_WEIGHT = 0.25
+CENTER_SCORE_WEIGHT = 0.15
+
+# Face tracking between processed frames (face_landmarks.FaceTracker)
+TRACK_PADDING = 0.5           # Search window margin, as a fraction of the last face size
+TRACK_SCALE_RANGE = 0.25      # Face size may change by this fraction between frames
+TRACK_FULL_SCAN_EVERY = 30    # Full-frame scan at least every N frames
+
+# Face detection resolution (face_landmarks.find_face)
+DETECTION_WIDTH = 640         # Frames wider than this are searched downscaled (0 = full resolution)
+FACE_MIN_FRACTION = 0.1       # Expected face size, as a fraction of the frame's shorter side
+FACE_MAX_FRACTION = 0.9
+
+# Eye detection (face_landmarks.detect_eyes)
+EYE_BAND_TOP = 0.15           # Eyes are searched between these fractions of the face height
+EYE_BAND_BOTTOM = 0.6
+EYE_DETECT_EVERY = 3          # With a tracker, detect eyes every N frames and reuse them in between
@@ -1,30 +1,202 @@
 import cv2
 import numpy as np
 
+from config import (TRACK_PADDING, TRACK_SCALE_RANGE, TRACK_FULL_SCAN_EVERY,
+                    DETECTION_WIDTH, FACE_MIN_FRACTION, FACE_MAX_FRACTION,
+                    EYE_BAND_TOP, EYE_BAND_BOTTOM, EYE_DETECT_EVERY)
+
 # Use OpenCV's Haar Cascade for face detection (simpler approach)
 face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
 
-class SimpleLandmark:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+# Rows of FaceLandmarks.points, with the face-mesh index each one stands in for
+NOSE = 0                # 1
+LEFT_EYE_CENTER = 1     # 33
+LEFT_EYE_TOP = 2        # 160
+LEFT_EYE_TOP_RIGHT = 3  # 158
+LEFT_EYE_RIGHT = 4      # 133
+LEFT_EYE_BOTTOM = 5     # 153
+LEFT_EYE_LEFT = 6       # 144
+RIGHT_EYE_CENTER = 7    # 263
+NUM_POINTS = 8
+
+
+class FaceLandmarks:
+    """
+    The points the scorers use, as one (NUM_POINTS, 2) array of x, y
+    normalized to the frame size (one allocation per frame).
+    """
+    __slots__ = ("points",)
+
+    def __init__(self, points):
+        self.points = points
+
+    @property
+    def nose(self):
+        return self.points[NOSE]
+
+    @property
+    def left_eye(self):
+        return self.points[LEFT_EYE_CENTER]
+
+    @property
+    def right_eye(self):
+        return self.points[RIGHT_EYE_CENTER]
+
+    @property
+    def left_eye_contour(self):
+        """The six left-eye points, in eye_aspect_ratio order"""
+        return self.points[LEFT_EYE_CENTER:RIGHT_EYE_CENTER]
+
+
+# Smallest face the default frontal cascade can see (its window size)
+CASCADE_WINDOW = 24
+
+
+def detection_scale(shape):
+    """Factor from full resolution down to the detection working resolution"""
+    if DETECTION_WIDTH <= 0 or shape[1] <= DETECTION_WIDTH:
+        return 1.0
+    return DETECTION_WIDTH / shape[1]
+
+
+def face_size_range(shape):
+    """Expected face side in full-resolution pixels, from the frame size"""
+    short_side = min(shape[:2])
+    return max(30, int(short_side * FACE_MIN_FRACTION)), int(short_side * FACE_MAX_FRACTION)
+
+
+def largest_face(faces):
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    return int(x), int(y), int(w), int(h)
+
+
+def find_face(gray, region=None, size_range=None):
+    """
+    Largest face as a full-resolution (x, y, w, h), or None.
+
+    The search runs on a copy of the region scaled to the working
+    resolution, with min/max face sizes scaled along, and the box is
+    mapped back. region is (x0, y0, x1, y1), default the whole frame;
+    size_range is (min_side, max_side) in full-resolution pixels.
+    """
+    x0, y0, x1, y1 = region if region is not None else (0, 0, gray.shape[1], gray.shape[0])
+    min_side, max_side = size_range if size_range is not None else face_size_range(gray.shape)
+    scale = detection_scale(gray.shape)
+
+    roi = gray[y0:y1, x0:x1]
+    if scale < 1.0:
+        roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    min_side = max(CASCADE_WINDOW, int(min_side * scale))
+    max_side = int(max_side * scale)
+    if max_side < min_side or min(roi.shape[:2]) < min_side:
+        return None
 
-def get_landmarks(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     # More lenient face detection parameters
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(30, 30))
+    faces = face_cascade.detectMultiScale(
+        roi, scaleFactor=1.1, minNeighbors=3,
+        minSize=(min_side, min_side), maxSize=(max_side, max_side))
+    if len(faces) == 0:
+        return None
+    fx, fy, fw, fh = largest_face(faces)
+    return (x0 + int(fx / scale), y0 + int(fy / scale), int(fw / scale), int(fh / scale))
+
+
+def detect_face(gray):
+    """Largest face in the whole frame as (x, y, w, h), or None"""
+    return find_face(gray)
+
+
+def detect_eyes(gray, face):
+    """Eye boxes (x, y, w, h) relative to the face box, searched in the upper-face band only"""
+    x, y, w, h = face
+    top, bottom = int(h * EYE_BAND_TOP), int(h * EYE_BAND_BOTTOM)
+    band = gray[y + top:y + bottom, x:x + w]
+    if min(band.shape[:2]) < 15:
+        return []
+
+    # More lenient eye detection parameters
+    eyes = eye_cascade.detectMultiScale(band, scaleFactor=1.05, minNeighbors=2, minSize=(15, 15))
+    return [(int(ex), int(ey) + top, int(ew), int(eh)) for ex, ey, ew, eh in eyes]
+
+
+class FaceTracker:
+    """
+    Follows one face across the frames of a stream (a session or the webcam).
+
+    A face barely moves between frames, so the next frame only searches a
+    padded window around the last box, at nearby scales. A miss, or every
+    full_scan_every frames, falls back to a full-frame scan.
+    """
+
+    def __init__(self, padding=TRACK_PADDING, scale_range=TRACK_SCALE_RANGE,
+                 full_scan_every=TRACK_FULL_SCAN_EVERY, eye_detect_every=EYE_DETECT_EVERY):
+        self.padding = padding
+        self.scale_range = scale_range
+        self.full_scan_every = full_scan_every
+        self.eye_detect_every = eye_detect_every
+        self.box = None
+        self.since_full_scan = 0
+        self.window_hits = 0
+        self.full_scans = 0
+        # Last detected eyes, as fractions of the face box they were found in
+        self.eye_boxes = None
+        self.since_eye_scan = 0
+        self.eye_scans = 0
+
+    def detect(self, gray):
+        if self.box is not None and self.since_full_scan < self.full_scan_every:
+            face = self._search_window(gray)
+            if face is not None:
+                self.box = face
+                self.since_full_scan += 1
+                self.window_hits += 1
+                return face
+
+        self.box = detect_face(gray)
+        self.since_full_scan = 0
+        self.full_scans += 1
+        if self.box is None:
+            self.eye_boxes = None
+        return self.box
+
+    def eyes(self, gray, face):
+        """Eye boxes for the face, detected every eye_detect_every frames and reused in between"""
+        x, y, w, h = face
+        if self.eye_boxes is None or self.since_eye_scan + 1 >= self.eye_detect_every:
+            eyes = detect_eyes(gray, face)
+            self.eye_boxes = [(ex / w, ey / h, ew / w, eh / h) for ex, ey, ew, eh in eyes]
+            self.since_eye_scan = 0
+            self.eye_scans += 1
+            return eyes
+
+        self.since_eye_scan += 1
+        return [(int(rx * w), int(ry * h), int(rw * w), int(rh * h))
+                for rx, ry, rw, rh in self.eye_boxes]
+
+    def _search_window(self, gray):
+        x, y, w, h = self.box
+        pad_x, pad_y = int(w * self.padding), int(h * self.padding)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1 = min(gray.shape[1], x + w + pad_x)
+        y1 = min(gray.shape[0], y + h + pad_y)
+
+        size = max(w, h)
+        min_side = max(30, int(size * (1 - self.scale_range)))
+        max_side = int(size * (1 + self.scale_range))
+        return find_face(gray, (x0, y0, x1, y1), (min_side, max_side))
+
+
+def get_landmarks(frame, tracker=None):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    face = tracker.detect(gray) if tracker is not None else detect_face(gray)
     
-    if len(faces) > 0:
-        # Get the largest face
-        face = max(faces, key=lambda f: f[2] * f[3])
+    if face is not None:
         x, y, w, h = face
         
-        # Extract face region
-        face_roi = gray[y:y+h, x:x+w]
-        
-        # Detect eyes in face region with more lenient parameters
-        eyes = eye_cascade.detectMultiScale(face_roi, scaleFactor=1.05, minNeighbors=2, minSize=(15, 15))
+        # Eyes in the upper part of the face region; with a tracker,
+        # recent eye positions are reused between detections
+        eyes = tracker.eyes(gray, face) if tracker is not None else detect_eyes(gray, face)
         
         # Create simplified landmark structure
         frame_h, frame_w = frame.shape[:2]
@@ -66,31 +238,19 @@ def get_landmarks(frame):
         eye_h = int(h * 0.08)  # Approximate eye height
         eye_w = int(w * 0.15)  # Approximate eye width
         
-        # Build landmark array matching expected indices
-        # Index mapping for scoring.py:
-        # 1: nose, 33: left eye center, 160/158/133/153/144: left eye points, 263: right eye
-        landmarks = [None] * 468
-        
-        # Nose tip (index 1)
-        landmarks[1] = SimpleLandmark(nose_x / frame_w, nose_y / frame_h)
-        
-        # Left eye landmarks
-        landmarks[33] = SimpleLandmark(le_x / frame_w, le_y / frame_h)  # Left eye center
-        landmarks[160] = SimpleLandmark((le_x) / frame_w, (le_y - eye_h) / frame_h)  # Top
-        landmarks[158] = SimpleLandmark((le_x + eye_w//2) / frame_w, (le_y - eye_h//2) / frame_h)  # Top right
-        landmarks[133] = SimpleLandmark((le_x + eye_w) / frame_w, le_y / frame_h)  # Right corner
-        landmarks[153] = SimpleLandmark(le_x / frame_w, (le_y + eye_h) / frame_h)  # Bottom
-        landmarks[144] = SimpleLandmark((le_x - eye_w) / frame_w, le_y / frame_h)  # Left corner
-        
-        # Right eye (index 263)
-        landmarks[263] = SimpleLandmark(re_x / frame_w, re_y / frame_h)
-        
-        # Fill remaining with face center as fallback
-        face_center = SimpleLandmark((x + w//2) / frame_w, (y + h//2) / frame_h)
-        for i in range(468):
-            if landmarks[i] is None:
-                landmarks[i] = face_center
-        
-        return landmarks
+        # Pixel positions in FaceLandmarks row order, normalized in one step
+        points = np.array([
+            (nose_x, nose_y),                          # Nose tip
+            (le_x, le_y),                              # Left eye center
+            (le_x, le_y - eye_h),                      # Top
+            (le_x + eye_w // 2, le_y - eye_h // 2),    # Top right
+            (le_x + eye_w, le_y),                      # Right corner
+            (le_x, le_y + eye_h),                      # Bottom
+            (le_x - eye_w, le_y),                      # Left corner
+            (re_x, re_y),                              # Right eye center
+        ], dtype=np.float64)
+        points /= (frame_w, frame_h)
+
+        return FaceLandmarks(points)
     
     return None
@@ -1,23 +1,17 @@
+import numpy as np
+
 from utils import distance
 from config import *
+from face_landmarks import NOSE, LEFT_EYE_CENTER, RIGHT_EYE_CENTER
 
-LEFT_EYE = [33, 160, 158, 133, 153, 144]
-
-def get_point(landmarks, idx, w, h):
+def to_pixels(point, w, h):
     return (
-        int(landmarks[idx].x * w),
-        int(landmarks[idx].y * h)
+        int(point[0] * w),
+        int(point[1] * h)
     )
 
 def eye_aspect_ratio(landmarks, w, h):
-    p = lambda i: get_point(landmarks, i, w, h)
-
-    p1 = p(LEFT_EYE[0])
-    p2 = p(LEFT_EYE[1])
-    p3 = p(LEFT_EYE[2])
-    p4 = p(LEFT_EYE[3])
-    p5 = p(LEFT_EYE[4])
-    p6 = p(LEFT_EYE[5])
+    p1, p2, p3, p4, p5, p6 = (to_pixels(p, w, h) for p in landmarks.left_eye_contour)
 
     vertical = distance(p2, p6) + distance(p3, p5)
     horizontal = distance(p1, p4)
@@ -39,9 +33,9 @@ def eye_score(ear):
         )
 
 def head_pose_score(landmarks, w, h):
-    nose = get_point(landmarks, 1, w, h)
-    left_eye = get_point(landmarks, 33, w, h)
-    right_eye = get_point(landmarks, 263, w, h)
+    nose = to_pixels(landmarks.nose, w, h)
+    left_eye = to_pixels(landmarks.left_eye, w, h)
+    right_eye = to_pixels(landmarks.right_eye, w, h)
 
     eye_center_x = (left_eye[0] + right_eye[0]) / 2
     offset = abs(nose[0] - eye_center_x)
@@ -82,7 +76,7 @@ def get_ear_value(landmarks, frame_shape):
 def get_nose_position(landmarks, frame_shape):
     """Get nose position for head stability tracking."""
     h, w, _ = frame_shape
-    return get_point(landmarks, 1, w, h)
+    return to_pixels(landmarks.nose, w, h)
 
 def face_center_score(landmarks, frame_shape):
     """
@@ -90,7 +84,7 @@ def face_center_score(landmarks, frame_shape):
     Face drifting to edges indicates distraction/multitasking.
     """
     h, w, _ = frame_shape
-    nose = get_point(landmarks, 1, w, h)
+    nose = to_pixels(landmarks.nose, w, h)
     
     center_x = w / 2
     center_y = h / 2
@@ -108,3 +102,85 @@ def face_center_score(landmarks, frame_shape):
     
     # Weight horizontal more than vertical
     return 0.7 * x_score + 0.3 * y_score
+
+
+def score_frames(points, frame_shape, previous_nose=None, movement_history=()):
+    """
+    Score many frames in one vectorized pass.
+
+    Gives the same numbers as calling attention_score, face_center_score
+    and get_nose_position frame by frame, and tracking stability the way
+    the live trackers do.
+
+    points: (N, NUM_POINTS, 2) normalized landmarks, e.g. FaceLandmarks.points stacked
+    frame_shape: one frame shape for all frames, or an (N, 2+) array of shapes
+    previous_nose: nose pixel position from before the first frame, if any
+    movement_history: movements already recorded before the first frame
+
+    Returns a dict of length-N arrays: ear, eye, head_pose, attention,
+    centering, nose (N, 2), movement (NaN without a previous position),
+    stability and combined.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    hw = np.asarray(frame_shape, dtype=np.float64)[..., :2]
+    h = hw[..., 0].reshape(-1, 1)
+    w = hw[..., 1].reshape(-1, 1)
+
+    # Truncate to whole pixels like to_pixels()
+    px = np.trunc(points * np.stack([w, h], axis=-1))
+
+    # Eye aspect ratio
+    p1, p2, p3, p4, p5, p6 = np.moveaxis(px[:, LEFT_EYE_CENTER:RIGHT_EYE_CENTER], 1, 0)
+    vertical = np.hypot(*(p2 - p6).T) + np.hypot(*(p3 - p5).T)
+    horizontal = np.hypot(*(p1 - p4).T)
+    ear = np.where(horizontal < 0.001, 0.2, vertical / (2 * np.maximum(horizontal, 0.001)))
+    eye = np.clip((ear - EAR_CLOSE_THRESHOLD) / (EAR_OPEN_THRESHOLD - EAR_CLOSE_THRESHOLD), 0, 1)
+
+    # Head pose
+    nose = px[:, NOSE]
+    eye_center_x = (px[:, LEFT_EYE_CENTER, 0] + px[:, RIGHT_EYE_CENTER, 0]) / 2
+    offset = np.abs(nose[:, 0] - eye_center_x)
+    head = np.clip(1 - (offset - HEAD_CENTER_THRESHOLD) / (HEAD_MAX_THRESHOLD - HEAD_CENTER_THRESHOLD), 0, 1)
+
+    gaze = 0.6 * head + 0.4 * eye
+    attention = GAZE_WEIGHT * gaze + HEAD_WEIGHT * head + EYE_WEIGHT * eye + FACE_WEIGHT * 1
+
+    # Face centering
+    w, h = w[:, 0], h[:, 0]
+    x_score = np.maximum(0, 1 - np.abs(nose[:, 0] - w / 2) / (w / 3))
+    y_score = np.maximum(0, 1 - np.abs(nose[:, 1] - h / 2) / (h / 2.5))
+    centering = 0.7 * x_score + 0.3 * y_score
+
+    # Movement between consecutive noses, then stability over a sliding window
+    start = np.full((1, 2), np.nan) if previous_nose is None else np.asarray([previous_nose], dtype=np.float64)
+    movement = np.hypot(*(nose - np.concatenate([start, nose[:-1]])).T)
+
+    history = np.asarray(list(movement_history), dtype=np.float64)
+    recorded = np.concatenate([history, movement[~np.isnan(movement)]])
+    totals = np.concatenate([[0.0], np.cumsum(recorded)])
+    length = len(history) + np.cumsum(~np.isnan(movement))
+    window = np.minimum(length, STABILITY_WINDOW)
+    avg_movement = (totals[length] - totals[length - window]) / np.maximum(window, 1)
+    stability = np.where(
+        length < STABILITY_MIN_HISTORY, 1.0,
+        np.clip(1 - (avg_movement - STABLE_MOVEMENT_THRESHOLD) /
+                (MAX_MOVEMENT_THRESHOLD - STABLE_MOVEMENT_THRESHOLD), 0, 1))
+
+    combined = (
+        BASE_SCORE_WEIGHT * attention +
+        STABILITY_SCORE_WEIGHT * stability +
+        CENTER_SCORE_WEIGHT * centering
+    )
+
+    return {
+        "ear": ear,
+        "eye": eye,
+        "head_pose": head,
+        "attention": attention,
+        "centering": centering,
+        "nose": nose.reshape(n, 2),
+        "movement": movement,
+        "stability": stability,
+        "combined": combined,
+    }
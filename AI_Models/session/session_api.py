@@ -4,6 +4,7 @@ Provides REST API endpoints for attention tracking.
 """
 
 from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Body
+from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 from uuid import uuid4
 import time
@@ -12,9 +13,12 @@ import numpy as np
 import httpx
 import os
 
-from face_landmarks import get_landmarks
-from scoring import attention_score, face_center_score, get_nose_position
+from face_landmarks import FaceTracker, get_landmarks
+from scoring import attention_score, face_center_score, get_nose_position, score_frames
 from utils import distance
+from config import (STABLE_MOVEMENT_THRESHOLD, MAX_MOVEMENT_THRESHOLD, STABILITY_WINDOW,
+                    STABILITY_MIN_HISTORY, BASE_SCORE_WEIGHT, STABILITY_SCORE_WEIGHT,
+                    CENTER_SCORE_WEIGHT)
 from notes_agent import generate_notes
 
 
@@ -37,19 +41,16 @@ app.add_middleware(
 # ============ SESSION STORAGE ============
 sessions = {}
 
-# ============ CONFIGURATION ============
-STABLE_MOVEMENT_THRESHOLD = 5
-MAX_MOVEMENT_THRESHOLD = 25
-
 # ============ HELPER FUNCTIONS ============
 
 
 def get_head_stability_score(movement_history):
     """Calculate head stability based on recent movement."""
-    if len(movement_history) < 5:
+    if len(movement_history) < STABILITY_MIN_HISTORY:
         return 1.0
 
-    avg_movement = sum(movement_history[-15:]) / len(movement_history[-15:])
+    recent = movement_history[-STABILITY_WINDOW:]
+    avg_movement = sum(recent) / len(recent)
 
     if avg_movement < STABLE_MOVEMENT_THRESHOLD:
         return 1.0
@@ -120,6 +121,7 @@ def start_session():
         "scores": [],
         "movement_history": [],
         "previous_nose_position": None,
+        "tracker": FaceTracker(),
         "frame_count": 0
     }
 
@@ -146,7 +148,7 @@ async def process_frame(session_id: str, file: UploadFile = File(...)):
     if frame is None:
         return {"error": "Could not decode image"}
 
-    landmarks = get_landmarks(frame)
+    landmarks = get_landmarks(frame, session["tracker"])
 
     if landmarks:
         # Get base attention score
@@ -167,9 +169,9 @@ async def process_frame(session_id: str, file: UploadFile = File(...)):
 
         # Combined attention score
         final_score = (
-            0.60 * base_score +
-            0.25 * stability_score +
-            0.15 * center_score
+            BASE_SCORE_WEIGHT * base_score +
+            STABILITY_SCORE_WEIGHT * stability_score +
+            CENTER_SCORE_WEIGHT * center_score
         )
 
         session["scores"].append(final_score)
@@ -198,6 +200,79 @@ async def process_frame(session_id: str, file: UploadFile = File(...)):
         }
 
 
+@app.post("/session/frames/{session_id}")
+async def process_frames(session_id: str, files: List[UploadFile] = File(...)):
+    """
+    Process several frames (in capture order) and score them in one batch.
+
+    Frames that cannot be decoded get {"error": "Could not decode image"}
+    in their slot, as /session/frame would return, and leave the scores
+    untouched.
+    """
+    if session_id not in sessions:
+        return {"error": "Invalid session ID"}
+
+    session = sessions[session_id]
+
+    shapes, points, face_frames, bad_frames = [], [], [], set()
+    for i, file in enumerate(files):
+        contents = await file.read()
+        frame = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            bad_frames.add(i)
+            continue
+        landmarks = get_landmarks(frame, session["tracker"])
+        if landmarks:
+            shapes.append(frame.shape)
+            points.append(landmarks.points)
+            face_frames.append(i)
+
+    scored = None
+    if face_frames:
+        scored = score_frames(
+            np.stack(points), np.asarray(shapes),
+            previous_nose=session["previous_nose_position"],
+            movement_history=session["movement_history"][-STABILITY_WINDOW:]
+        )
+        moved = scored["movement"][~np.isnan(scored["movement"])]
+        session["movement_history"].extend(moved.tolist())
+        session["previous_nose_position"] = tuple(int(v) for v in scored["nose"][-1])
+
+    # Walk frames in order: missing faces decay the previous score
+    results = []
+    face_rows = dict(zip(face_frames, range(len(face_frames))))
+    for i in range(len(files)):
+        session["frame_count"] += 1
+        if i in bad_frames:
+            results.append({
+                "error": "Could not decode image",
+                "frame_number": session["frame_count"]
+            })
+            continue
+        row = face_rows.get(i)
+        if row is None:
+            last_score = session["scores"][-1] if session["scores"] else 0.0
+            session["scores"].append(last_score * 0.9)
+            results.append({
+                "attention_score": round(last_score * 0.9, 3),
+                "face_detected": False,
+                "frame_number": session["frame_count"]
+            })
+            continue
+
+        final_score = float(scored["combined"][row])
+        session["scores"].append(final_score)
+        results.append({
+            "attention_score": round(final_score, 3),
+            "stability_score": round(float(scored["stability"][row]), 3),
+            "centering_score": round(float(scored["centering"][row]), 3),
+            "face_detected": True,
+            "frame_number": session["frame_count"]
+        })
+
+    return {"frames": results}
+
+
 @app.post("/session/end/{session_id}")
 def end_session(session_id: str):
     """End session and return summary statistics."""
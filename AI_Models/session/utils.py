@@ -1,4 +1,4 @@
-import numpy as np
+import math
 
 def distance(p1, p2):
-    return np.linalg.norm(np.array(p1) - np.array(p2))
+    return math.dist(p1, p2)